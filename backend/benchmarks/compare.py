@@ -0,0 +1,73 @@
+# benchmarks/compare.py
+"""
+Compare two benchmark reports written by benchmarks.run.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+
+Prints each metric side by side with its relative change and exits with
+status 1 if throughput dropped, or p95/p99 latency, TTFB or peak RSS grew, by
+more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+# (path in the report, True if bigger is better)
+METRICS = [
+    (('throughput_rps',), True),
+    (('latency_ms', 'p50'), False),
+    (('latency_ms', 'p95'), False),
+    (('latency_ms', 'p99'), False),
+    (('ttfb_ms', 'p50'), False),
+    (('ttfb_ms', 'p95'), False),
+    (('ttfb_ms', 'p99'), False),
+    (('server_peak_rss_mb',), False),
+    (('upstream', 'tts', 'requests'), False),
+    (('upstream', 'translate', 'requests'), False),
+]
+# Only these fail the comparison; the rest are informational
+GATED = {('throughput_rps',), ('latency_ms', 'p95'), ('latency_ms', 'p99'), ('ttfb_ms', 'p95'), ('server_peak_rss_mb',)}
+
+
+def lookup(report, path):
+    for key in path:
+        if not isinstance(report, dict) or report.get(key) is None:
+            return None
+        report = report[key]
+    return report
+
+
+def compare(baseline, candidate, threshold):
+    """Yield (name, baseline, candidate, change %, regressed) for every metric present in both reports."""
+    for path, higher_is_better in METRICS:
+        before, after = lookup(baseline, path), lookup(candidate, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        worse = -change if higher_is_better else change
+        yield '.'.join(path), before, after, change, path in GATED and worse > threshold
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10, help='Allowed regression in percent.')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"{'metric':<28}{baseline.get('label') or baseline.get('revision') or 'baseline':>14}"
+          f"{candidate.get('label') or candidate.get('revision') or 'candidate':>14}{'change':>10}")
+    regressed = False
+    for name, before, after, change, worse in compare(baseline, candidate, args.threshold):
+        regressed |= worse
+        print(f"{name:<28}{before:>14}{after:>14}{change:>+9.1f}%{'  REGRESSION' if worse else ''}")
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
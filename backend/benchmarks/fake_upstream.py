@@ -0,0 +1,145 @@
+# benchmarks/fake_upstream.py
+"""
+Stand-in for Google's batchexecute endpoint, used by the benchmarks.
+
+Answers the TTS (jQ1olc) and translate (MkEWBc) RPCs that langserver sends,
+after a configurable latency with an exponential jitter tail, and fails a
+configurable fraction of requests with 500 or 429. Point langserver at it with
+TTS_UPSTREAM_URL / TRANSLATE_UPSTREAM_URL.
+
+Run standalone (e.g. to benchmark a gunicorn deployment by hand):
+    python -m benchmarks.fake_upstream --port 8001 --latency-ms 80 --jitter-ms 40 --error-rate 0.01
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+TTS_RPC = 'jQ1olc'
+TRANSLATE_RPC = 'MkEWBc'
+
+# One silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, 417 bytes
+MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+
+def fake_audio(text):
+    """Roughly one frame per two characters, like a short spoken phrase."""
+    return MP3_FRAME * max(1, len(text) // 2)
+
+
+def fake_translation(text, dest):
+    return f"{text}@{dest}"
+
+
+class FakeUpstream:
+    """A threaded HTTP server that counts the calls and RPCs it answers."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, jitter=0.0, error_rate=0.0, throttle_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.counts = {'requests': 0, 'tts_rpcs': 0, 'translate_rpcs': 0, 'errors': 0, 'throttled': 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/_/TranslateWebserverUi/data/batchexecute"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='fake-upstream', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self.counts[name] += value
+
+    def _delay(self):
+        return self.latency + (random.expovariate(1 / self.jitter) if self.jitter else 0)
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+                rpcs = json.loads(parse_qs(body)['f.req'][0])[0]
+                upstream._count(requests=1)
+                time.sleep(upstream._delay())
+
+                roll = random.random()
+                if roll < upstream.throttle_rate:
+                    upstream._count(throttled=1)
+                    return self._reply(429, b'Too Many Requests')
+                if roll < upstream.throttle_rate + upstream.error_rate:
+                    upstream._count(errors=1)
+                    return self._reply(500, b'Internal Server Error')
+
+                lines = [")]}'", '']
+                for rpc_id, params, _, tag in rpcs:
+                    params = json.loads(params)
+                    if rpc_id == TTS_RPC:
+                        upstream._count(tts_rpcs=1)
+                        encoded = base64.b64encode(fake_audio(params[0])).decode('ascii')
+                        payload = json.dumps([encoded])
+                    else:
+                        upstream._count(translate_rpcs=1)
+                        text, _, dest = params[0][:3]
+                        payload = json.dumps([None, [[[None, None, None, True, None, [[fake_translation(text, dest)]]]]]])
+                    # Compact separators, like Google's: gTTS matches the raw text of the line
+                    lines.append(json.dumps([['wrb.fr', rpc_id, payload, None, None, None, tag]], separators=(',', ':')))
+                self._reply(200, '\n'.join(lines).encode('utf-8'))
+
+            def _reply(self, status, body):
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Mean of the exponential latency tail.')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests answered with 500.')
+    parser.add_argument('--throttle-rate', type=float, default=0, help='Fraction of requests answered with 429.')
+    args = parser.parse_args()
+
+    upstream = FakeUpstream(args.host, args.port, args.latency_ms / 1000, args.jitter_ms / 1000,
+                            args.error_rate, args.throttle_rate)
+    print(f"Serving fake upstream on {upstream.url}")
+    try:
+        upstream._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(upstream.snapshot()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+# benchmarks/run.py
+"""
+Load-test /generate-speech against local stand-in upstream servers.
+
+Starts fake TTS and translate servers (see fake_upstream.py), launches
+langserver in a subprocess pointed at them, drives it with concurrent
+keep-alive clients and writes a JSON report with throughput, latency and
+time-to-first-byte percentiles, the server's peak RSS and upstream call
+counts. No network access is needed.
+
+Example (from backend/):
+    python -m benchmarks.run --requests 2000 --concurrency 32 --languages en,de,fr,zh-TW \\
+        --mode translations --tts-latency-ms 80 --tts-jitter-ms 40 --output before.json
+    python -m benchmarks.compare before.json after.json
+
+Server settings are passed through with --env, e.g. --env SPEECH_WORKERS=64.
+Use --target to drive an already running server instead; upstream counts and
+RSS are then omitted unless it was pointed at upstreams started here.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+from .fake_upstream import FakeUpstream
+
+
+def percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+    return {
+        'p50': round(rank(0.50) * 1000, 2),
+        'p95': round(rank(0.95) * 1000, 2),
+        'p99': round(rank(0.99) * 1000, 2),
+        'max': round(ordered[-1] * 1000, 2),
+        'mean': round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def build_payload(args, rng):
+    """A /generate-speech payload drawn from a vocabulary of `args.vocabulary` phrases."""
+    phrase = f"benchmark phrase number {rng.randrange(args.vocabulary)}"
+    languages = args.languages.split(',')
+    if args.mode == 'localization':
+        payload = {'localization': {language: f"{phrase} {language}" for language in languages}}
+    else:
+        payload = {'text': phrase, 'language': languages[0], 'translations': languages[1:]}
+    if args.stream:
+        payload['stream'] = True
+    return payload
+
+
+class Server:
+    """langserver in a subprocess with a throwaway database and audio store."""
+
+    def __init__(self, env):
+        self.workdir = tempfile.mkdtemp(prefix='langserver-bench-')
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.log_path = os.path.join(self.workdir, 'server.log')
+        self.env = dict(os.environ, LOGLEVEL='WARNING', DATABASE_URI=f"sqlite:///{self.workdir}/tokens.db",
+                        AUDIO_STORE_DIR=f"{self.workdir}/audio", TOKEN_RATE_LIMIT_DB=f"{self.workdir}/ratelimit.db")
+        self.env.update(env)
+        self.process = None
+
+    def start(self, timeout=60):
+        log = open(self.log_path, 'w')
+        backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen([sys.executable, '-m', 'benchmarks.server', '--port', str(self.port)],
+                                        cwd=backend, env=self.env, stdout=log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with {self.process.returncode}, see {self.log_path}")
+            try:
+                with urllib.request.urlopen(f"{self.url}/readyz", timeout=5) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError(f"Server not ready after {timeout}s, see {self.log_path}")
+
+    def peak_rss_mb(self):
+        # VmHWM is the resident set high-water mark of the process
+        try:
+            with open(f"/proc/{self.process.pid}/status") as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            return None
+
+    def stop(self, keep_workdir=False):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if not keep_workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def create_token(url, admin_token):
+    request = urllib.request.Request(
+        f"{url}/add-token", method='POST', headers={'Content-Type': 'application/json'},
+        data=json.dumps({'id': f"bench-{int(time.time())}", 'rate_limit': 10 ** 9}).encode(),
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)['token']
+
+
+class LoadGenerator:
+    """`concurrency` clients sending requests back to back over keep-alive connections."""
+
+    def __init__(self, url, token, args):
+        self.url = urlsplit(url)
+        self.token = token
+        self.args = args
+        self.results = []
+        self.statuses = {}
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._remaining = args.requests
+        self._deadline = None
+
+    def run(self):
+        threads = [threading.Thread(target=self._client, args=(seed,)) for seed in range(self.args.concurrency)]
+        started = time.perf_counter()
+        if self.args.duration:
+            self._deadline = started + self.args.duration
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def _take(self):
+        with self._lock:
+            if self._deadline is not None:
+                return time.perf_counter() < self._deadline
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+    def _client(self, seed):
+        rng = random.Random(self.args.seed * 1000 + seed)
+        connection = http.client.HTTPConnection(self.url.hostname, self.url.port, timeout=self.args.timeout)
+        headers = {'Authorization': self.token, 'Content-Type': 'application/json'}
+        while self._take():
+            body = json.dumps(build_payload(self.args, rng))
+            started = time.perf_counter()
+            try:
+                connection.request('POST', '/generate-speech', body=body, headers=headers)
+                response = connection.getresponse()
+                first = response.read(1)
+                ttfb = time.perf_counter() - started
+                size = len(first) + len(response.read())
+                status = response.status
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                ttfb, size, status = None, 0, type(e).__name__
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.results.append((elapsed, ttfb, status))
+                self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+                self.bytes_received += size
+        connection.close()
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500, help='Total requests (ignored with --duration).')
+    parser.add_argument('--duration', type=float, default=None, help='Run for this many seconds instead.')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--mode', choices=('localization', 'translations'), default='localization')
+    parser.add_argument('--languages', default='en,de,fr,es', help='Comma-separated; the first is the source language.')
+    parser.add_argument('--vocabulary', type=int, default=1000, help='Distinct phrases; smaller means more cache hits.')
+    parser.add_argument('--stream', action='store_true', help='Request streamed responses.')
+    parser.add_argument('--token', choices=('api', 'admin'), default='api',
+                        help='Authenticate with a fresh API token (exercises auth and rate limiting) or the admin token.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=60, help='Client socket timeout in seconds.')
+    for service in ('tts', 'translate'):
+        parser.add_argument(f'--{service}-latency-ms', type=float, default=50)
+        parser.add_argument(f'--{service}-jitter-ms', type=float, default=0, help='Mean of the exponential latency tail.')
+        parser.add_argument(f'--{service}-error-rate', type=float, default=0)
+        parser.add_argument(f'--{service}-throttle-rate', type=float, default=0)
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE', help='Extra server environment.')
+    parser.add_argument('--target', default=None, help='Benchmark a running server at this URL instead.')
+    parser.add_argument('--admin-token', default=None, help='Admin token of the --target server.')
+    parser.add_argument('--label', default=None, help='Free-form name stored in the report.')
+    parser.add_argument('--output', default=None, help='Write the JSON report here.')
+    parser.add_argument('--keep-workdir', action='store_true', help="Keep the server's database, audio and log.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    upstreams = {}
+    server = None
+    try:
+        if args.target:
+            url, admin_token = args.target.rstrip('/'), args.admin_token
+        else:
+            for service in ('tts', 'translate'):
+                upstreams[service] = FakeUpstream(
+                    latency=getattr(args, f'{service}_latency_ms') / 1000,
+                    jitter=getattr(args, f'{service}_jitter_ms') / 1000,
+                    error_rate=getattr(args, f'{service}_error_rate'),
+                    throttle_rate=getattr(args, f'{service}_throttle_rate'),
+                ).start()
+            admin_token = 'bench-admin-token'
+            env = dict(pair.split('=', 1) for pair in args.env)
+            env.update(ADMIN_TOKEN=admin_token, TTS_UPSTREAM_URL=upstreams['tts'].url,
+                       TRANSLATE_UPSTREAM_URL=upstreams['translate'].url)
+            server = Server(env)
+            server.start()
+            url = server.url
+
+        token = admin_token if args.token == 'admin' else create_token(url, admin_token)
+        generator = LoadGenerator(url, token, args)
+        elapsed = generator.run()
+        peak_rss = server.peak_rss_mb() if server else None
+    finally:
+        if server:
+            server.stop(keep_workdir=args.keep_workdir)
+        for upstream in upstreams.values():
+            upstream.stop()
+
+    latencies = [elapsed_s for elapsed_s, _, status in generator.results if status == 200]
+    ttfbs = [ttfb for _, ttfb, status in generator.results if status == 200]
+    report = {
+        'label': args.label,
+        'revision': git_revision(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'config': vars(args),
+        'requests': len(generator.results),
+        'statuses': generator.statuses,
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'latency_ms': percentiles(latencies),
+        'ttfb_ms': percentiles(ttfbs),
+        'bytes_received': generator.bytes_received,
+        'server_peak_rss_mb': peak_rss,
+        'upstream': {service: upstream.snapshot() for service, upstream in upstreams.items()},
+    }
+
+    print(json.dumps({key: report[key] for key in ('requests', 'statuses', 'throughput_rps', 'latency_ms',
+                                                   'ttfb_ms', 'server_peak_rss_mb', 'upstream')}, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+# benchmarks/server.py
+"""
+Run langserver for a benchmark: the threaded Werkzeug server with the
+per-address Flask-Limiter limits switched off, so the load generator's single
+address isn't throttled. Configuration comes from the environment as usual.
+"""
+import argparse
+
+from langserver import app, limiter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    limiter.enabled = False
+    app.run(host=args.host, port=args.port, threaded=True, use_reloader=False)
+
+
+if __name__ == '__main__':
+    main()
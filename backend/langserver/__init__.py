@@ -4,9 +4,22 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
+from sqlalchemy import event
 import os
 import sys
 import logging
+import threading
+from .cache import LRUCache
+from .audio_store import AudioStore
+from .scheduler import SpeechScheduler
+from .upstream import UpstreamClient
+from .singleflight import SingleFlight
+from .resilience import CircuitBreaker, ResilientCaller
+from .engines import GTTSEngine, EspeakEngine, EngineRouter
+from .audio import Transcoder
+from .assets import StaticAssets
+from .languages import LanguageRegistry, normalize_code
+from .ratelimit import TokenRateLimiter, MemoryBucketStorage, SQLiteBucketStorage
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -55,6 +68,122 @@ except ValueError:
     logging.error("Invalid DEFAULT_RATE_LIMIT value. Must be a positive integer. Falling back to default 10.")
     app.config['DEFAULT_RATE_LIMIT'] = 10
 
+
+def env_int(name, default, minimum=1):
+    """Read an integer setting from the environment, falling back to `default` if invalid."""
+    value_str = os.environ.get(name)
+    if value_str is None:
+        return default
+    try:
+        value = int(value_str)
+        if value < minimum:
+            raise ValueError
+        return value
+    except ValueError:
+        logging.error(f"Invalid {name} value. Must be an integer >= {minimum}. Falling back to default {default}.")
+        return default
+
+
+def env_pins(name):
+    """Read "language:engine" pairs separated by commas into {normalized language code: engine name}."""
+    pins = {}
+    for pin in os.environ.get(name, '').split(','):
+        language, _, engine = pin.partition(':')
+        if language.strip() and engine.strip():
+            pins[normalize_code(language)] = engine.strip().lower()
+        elif pin.strip():
+            logging.error(f"Invalid {name} entry {pin.strip()!r}. Must be language:engine. Ignoring it.")
+    return pins
+
+
+# Database connection tuning. SQLite runs in WAL mode so token admin writes
+# don't block the readers serving speech traffic; Postgres gets a sized pool.
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = env_int('SQLITE_BUSY_TIMEOUT_MS', 5000, minimum=0)
+if db_engine == 'postgres':
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': env_int('POSTGRES_POOL_SIZE', 10),
+        'max_overflow': env_int('POSTGRES_MAX_OVERFLOW', 20, minimum=0),
+        'pool_timeout': env_int('POSTGRES_POOL_TIMEOUT', 30),
+        'pool_recycle': env_int('POSTGRES_POOL_RECYCLE', 30 * 60),
+        'pool_pre_ping': True,
+    }
+
+# Token administration limits
+app.config['TOKEN_BULK_MAX'] = env_int('TOKEN_BULK_MAX', 10000)
+app.config['LIST_TOKENS_MAX_PAGE'] = env_int('LIST_TOKENS_MAX_PAGE', 1000)
+
+# Segment cache configuration
+app.config['TTS_CACHE_MAX_BYTES'] = env_int('TTS_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+app.config['TTS_CACHE_TTL'] = env_int('TTS_CACHE_TTL', 24 * 60 * 60, minimum=0)
+
+# Cache-Control sent with complete /generate-speech responses
+app.config['SPEECH_CACHE_CONTROL'] = os.environ.get('SPEECH_CACHE_CONTROL', 'private, max-age=86400')
+
+# Persistent audio store configuration (0 disables the store)
+app.config['AUDIO_STORE_DIR'] = os.environ.get('AUDIO_STORE_DIR', f'{config_dir}/audio')
+app.config['AUDIO_STORE_MAX_BYTES'] = env_int('AUDIO_STORE_MAX_BYTES', 1024 * 1024 * 1024, minimum=0)
+
+# Translation cache configuration
+app.config['TRANSLATION_CACHE_MAX_BYTES'] = env_int('TRANSLATION_CACHE_MAX_BYTES', 8 * 1024 * 1024)
+app.config['TRANSLATION_CACHE_PERSIST'] = os.environ.get('TRANSLATION_CACHE_PERSIST', 'true').lower() in ('1', 'true', 'yes')
+
+# Authenticated token cache configuration
+app.config['TOKEN_CACHE_SIZE'] = env_int('TOKEN_CACHE_SIZE', 10000)
+app.config['TOKEN_CACHE_TTL'] = env_int('TOKEN_CACHE_TTL', 60)
+app.config['TOKEN_CACHE_NEGATIVE_TTL'] = env_int('TOKEN_CACHE_NEGATIVE_TTL', 10)
+app.config['TOKEN_CACHE_NEGATIVE_SIZE'] = env_int('TOKEN_CACHE_NEGATIVE_SIZE', 1000)
+
+# Per-token rate limiter storage: 'memory' (per worker) or 'sqlite' (shared by workers on a node)
+app.config['TOKEN_RATE_LIMIT_STORAGE'] = os.environ.get('TOKEN_RATE_LIMIT_STORAGE', 'memory').lower()
+app.config['TOKEN_RATE_LIMIT_DB'] = os.environ.get('TOKEN_RATE_LIMIT_DB', f'{config_dir}/ratelimit.db')
+
+# Shared speech worker pool configuration
+app.config['SPEECH_WORKERS'] = env_int('SPEECH_WORKERS', 32)
+app.config['SPEECH_QUEUE_SIZE'] = env_int('SPEECH_QUEUE_SIZE', 1000)
+app.config['SPEECH_RETRY_AFTER'] = env_int('SPEECH_RETRY_AFTER', 5)
+app.config['SPEECH_BATCH_MAX_ITEMS'] = env_int('SPEECH_BATCH_MAX_ITEMS', 200)
+
+# Background speech job configuration
+app.config['JOB_WORKERS'] = env_int('JOB_WORKERS', 2)
+app.config['JOB_RETENTION'] = env_int('JOB_RETENTION', 24 * 60 * 60)
+app.config['TRANSLATE_CONCURRENCY'] = env_int('TRANSLATE_CONCURRENCY', 8)
+app.config['TTS_CONCURRENCY'] = env_int('TTS_CONCURRENCY', 16)
+app.config['UPSTREAM_POOL_SIZE'] = env_int('UPSTREAM_POOL_SIZE', app.config['TTS_CONCURRENCY'])
+# Window (0 disables batching) and size of batched upstream translate calls
+app.config['TRANSLATE_BATCH_WINDOW_MS'] = env_int('TRANSLATE_BATCH_WINDOW_MS', 10, minimum=0)
+app.config['TRANSLATE_BATCH_MAX'] = env_int('TRANSLATE_BATCH_MAX', 16)
+# Replacement batchexecute endpoints, e.g. the stand-in servers in benchmarks/
+app.config['TTS_UPSTREAM_URL'] = os.environ.get('TTS_UPSTREAM_URL')
+app.config['TRANSLATE_UPSTREAM_URL'] = os.environ.get('TRANSLATE_UPSTREAM_URL')
+
+# Upstream resilience: per-call deadline, retries, hedging (after the recent p95) and circuit breaker
+app.config['UPSTREAM_TIMEOUT_MS'] = env_int('UPSTREAM_TIMEOUT_MS', 10000)
+app.config['UPSTREAM_RETRIES'] = env_int('UPSTREAM_RETRIES', 2, minimum=0)
+app.config['UPSTREAM_HEDGE'] = os.environ.get('UPSTREAM_HEDGE', 'true').lower() in ('1', 'true', 'yes')
+app.config['UPSTREAM_HEDGE_MIN_DELAY_MS'] = env_int('UPSTREAM_HEDGE_MIN_DELAY_MS', 100, minimum=0)
+app.config['CIRCUIT_FAILURE_THRESHOLD'] = env_int('CIRCUIT_FAILURE_THRESHOLD', 5)
+app.config['CIRCUIT_RESET_SECONDS'] = env_int('CIRCUIT_RESET_SECONDS', 30)
+
+# TTS engines ('gtts', 'espeak') and per-language pins such as "de:espeak,en:gtts";
+# unpinned languages go to the fastest available engine
+app.config['TTS_ENGINES'] = [name.strip().lower() for name in os.environ.get('TTS_ENGINES', 'gtts').split(',') if name.strip()]
+app.config['TTS_ENGINE_PINS'] = env_pins('TTS_ENGINE_PINS')
+app.config['ESPEAK_CONCURRENCY'] = env_int('ESPEAK_CONCURRENCY', os.cpu_count() or 1)
+
+# Transcoding to Opus/AAC with ffmpeg: concurrent processes, per-call timeout and bitrates
+app.config['TRANSCODE_CONCURRENCY'] = env_int('TRANSCODE_CONCURRENCY', os.cpu_count() or 1)
+app.config['TRANSCODE_TIMEOUT'] = env_int('TRANSCODE_TIMEOUT', 30)
+app.config['OPUS_BITRATE'] = os.environ.get('OPUS_BITRATE', '24k')
+app.config['AAC_BITRATE'] = os.environ.get('AAC_BITRATE', '48k')
+
+# Admin UI build (web/build), indexed on the first /admin request
+app.config['ADMIN_BUILD_DIR'] = os.path.abspath(os.environ.get('ADMIN_BUILD_DIR', '/app/web'))
+
+# Write-behind usage accounting: flush interval, pending keys that force an early flush, bucket width
+app.config['USAGE_FLUSH_INTERVAL'] = env_int('USAGE_FLUSH_INTERVAL', 10)
+app.config['USAGE_FLUSH_MAX_KEYS'] = env_int('USAGE_FLUSH_MAX_KEYS', 1000)
+app.config['USAGE_BUCKET_SECONDS'] = env_int('USAGE_BUCKET_SECONDS', 60 * 60)
+
 # Environment variable for log level
 log_level = os.environ.get('LOGLEVEL', 'INFO').upper()
 
@@ -80,11 +209,117 @@ logging.basicConfig(
 
 # Initialize extensions
 db = SQLAlchemy(app)
+
+
+def configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # In-memory databases can't use WAL; SQLite keeps them in "memory" mode
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}")
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA cache_size=-16000')
+    cursor.close()
+
+
+if db_engine == 'sqlite':
+    with app.app_context():
+        event.listen(db.engine, 'connect', configure_sqlite)
 limiter = Limiter(key_func=get_remote_address, default_limits=["200 per day", "50 per hour"])
 limiter.init_app(app)
+segment_cache = LRUCache(app.config['TTS_CACHE_MAX_BYTES'], ttl=app.config['TTS_CACHE_TTL'])
+audio_store = AudioStore(app.config['AUDIO_STORE_DIR'], app.config['AUDIO_STORE_MAX_BYTES'])
+speech_scheduler = SpeechScheduler(
+    app.config['SPEECH_WORKERS'],
+    app.config['SPEECH_QUEUE_SIZE'],
+    translate_concurrency=app.config['TRANSLATE_CONCURRENCY'],
+    tts_concurrency=app.config['TTS_CONCURRENCY'],
+    retry_after=app.config['SPEECH_RETRY_AFTER'],
+)
+upstream = UpstreamClient(
+    app.config['UPSTREAM_POOL_SIZE'],
+    timeout=app.config['UPSTREAM_TIMEOUT_MS'] / 1000.0,
+    tts_url=app.config['TTS_UPSTREAM_URL'],
+    translate_url=app.config['TRANSLATE_UPSTREAM_URL'],
+)
+
+
+def resilient_caller(service, slots, concurrency):
+    breaker = CircuitBreaker(service, app.config['CIRCUIT_FAILURE_THRESHOLD'], app.config['CIRCUIT_RESET_SECONDS'])
+    return ResilientCaller(
+        service,
+        breaker,
+        deadline=app.config['UPSTREAM_TIMEOUT_MS'] / 1000.0,
+        retries=app.config['UPSTREAM_RETRIES'],
+        hedge=app.config['UPSTREAM_HEDGE'],
+        hedge_min_delay=app.config['UPSTREAM_HEDGE_MIN_DELAY_MS'] / 1000.0,
+        # Room for every concurrent call plus its hedge
+        hedge_workers=2 * concurrency,
+        slots=slots,
+    )
+
+
+tts_caller = resilient_caller('tts', speech_scheduler.tts_slots, app.config['TTS_CONCURRENCY'])
+translate_caller = resilient_caller('translate', speech_scheduler.translate_slots, app.config['TRANSLATE_CONCURRENCY'])
+
+tts_engines = []
+for engine_name in app.config['TTS_ENGINES']:
+    if engine_name == 'gtts':
+        tts_engines.append(GTTSEngine(upstream, tts_caller, speech_scheduler.tts_slots))
+    elif engine_name == 'espeak':
+        espeak_engine = EspeakEngine(threading.BoundedSemaphore(app.config['ESPEAK_CONCURRENCY']))
+        if not espeak_engine.available():
+            logging.warning("espeak engine enabled but espeak-ng/espeak or lame/ffmpeg is not installed")
+        tts_engines.append(espeak_engine)
+    else:
+        logging.error(f"Unknown TTS engine {engine_name} in TTS_ENGINES. Ignoring it.")
+if not tts_engines:
+    logging.error("No valid TTS_ENGINES configured. Falling back to gtts.")
+    tts_engines.append(GTTSEngine(upstream, tts_caller, speech_scheduler.tts_slots))
+for language, engine_name in list(app.config['TTS_ENGINE_PINS'].items()):
+    if engine_name not in {engine.name for engine in tts_engines}:
+        logging.error(f"TTS_ENGINE_PINS pins {language} to {engine_name}, which is not in TTS_ENGINES. Ignoring it.")
+        del app.config['TTS_ENGINE_PINS'][language]
+tts_router = EngineRouter(tts_engines, pins=app.config['TTS_ENGINE_PINS'])
+language_registry = LanguageRegistry(tts_engines)
+transcoder = Transcoder(threading.BoundedSemaphore(app.config['TRANSCODE_CONCURRENCY']),
+                        bitrates={'opus': app.config['OPUS_BITRATE'], 'aac': app.config['AAC_BITRATE']},
+                        timeout=app.config['TRANSCODE_TIMEOUT'])
+inflight = SingleFlight()
+
+if app.config['TOKEN_RATE_LIMIT_STORAGE'] == 'sqlite':
+    token_rate_limiter = TokenRateLimiter(SQLiteBucketStorage(app.config['TOKEN_RATE_LIMIT_DB']))
+else:
+    if app.config['TOKEN_RATE_LIMIT_STORAGE'] != 'memory':
+        logging.error("Invalid TOKEN_RATE_LIMIT_STORAGE value. Must be 'memory' or 'sqlite'. Falling back to memory.")
+    token_rate_limiter = TokenRateLimiter(MemoryBucketStorage())
+
+from .translation import TranslationCache, TranslationBatcher
+translation_cache = TranslationCache(app, app.config['TRANSLATION_CACHE_MAX_BYTES'],
+                                     persist=app.config['TRANSLATION_CACHE_PERSIST'])
+translation_batcher = TranslationBatcher(
+    upstream,
+    speech_scheduler.translate_slots,
+    window=app.config['TRANSLATE_BATCH_WINDOW_MS'] / 1000.0,
+    max_batch=app.config['TRANSLATE_BATCH_MAX'],
+    caller=translate_caller,
+)
+
+from .auth import TokenCache
+token_cache = TokenCache(app.config['TOKEN_CACHE_SIZE'], app.config['TOKEN_CACHE_TTL'],
+                         app.config['TOKEN_CACHE_NEGATIVE_TTL'],
+                         negative_entries=app.config['TOKEN_CACHE_NEGATIVE_SIZE'])
+
+from .usage import UsageRecorder
+usage_recorder = UsageRecorder(app, flush_interval=app.config['USAGE_FLUSH_INTERVAL'],
+                               max_pending=app.config['USAGE_FLUSH_MAX_KEYS'],
+                               bucket_seconds=app.config['USAGE_BUCKET_SECONDS'])
+
+# Import routes and CLI commands
+admin_assets = StaticAssets(app.config['ADMIN_BUILD_DIR'])
 
-# Import routes
 from . import routes
+from . import cli
 
 # Other configurations and app-related code
 # After defining your models and before starting the app
@@ -0,0 +1,129 @@
+# langserver/assets.py
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import threading
+from collections import namedtuple
+
+from flask import Response, request, send_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Create React App puts a content hash in every file name under static/, e.g. main.69b7bff0.js
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml',
+                      'image/vnd.microsoft.icon')
+# Variants written next to the files at build time (see the Dockerfile), by content coding
+PRECOMPRESSED = {'br': '.br', 'gzip': '.gz'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Unhashed files such as index.html must be revalidated so a deploy shows up
+REVALIDATE = 'no-cache'
+
+"""
+One indexed file: its path on disk, content type, strong ETag (a digest of
+the content), Cache-Control value, and the compressed variants that came out
+smaller than the file, keyed by content coding.
+"""
+Asset = namedtuple('Asset', ['path', 'mimetype', 'etag', 'cache_control', 'encodings'])
+
+
+class StaticAssets:
+    """
+    The admin SPA build, indexed on the first admin request.
+
+    Compressed variants of text assets are kept in memory, so clients that
+    accept an encoding get one with no per-request work. The Docker build
+    writes them next to each file (main.js.gz, main.js.br); files without
+    them are gzip-compressed (and brotli-compressed when the brotli package
+    is installed) while indexing, except source maps, which are large and
+    rarely fetched. Clients that accept no encoding are sent the file itself
+    through send_file, which lets the WSGI server use sendfile.
+    Content-hashed files are cacheable forever; everything else is
+    revalidated against its ETag.
+    """
+
+    def __init__(self, root, min_size=1024):
+        self.root = root
+        self.min_size = min_size
+        self.assets = None
+        self._lock = threading.Lock()
+
+    def index(self):
+        """(Re)read the build directory. Returns the number of files indexed."""
+        assets = {}
+        if os.path.isdir(self.root):
+            for directory, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    path = os.path.join(directory, filename)
+                    if any(path.endswith(suffix) and os.path.exists(path[:-len(suffix)])
+                           for suffix in PRECOMPRESSED.values()):
+                        continue
+                    name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                    assets[name] = self._load(name, path)
+        else:
+            logging.warning(f"Admin UI build directory {self.root} not found; /admin will return 404")
+        self.assets = assets
+        logging.info(f"Indexed {len(assets)} admin UI files from {self.root}")
+        return len(assets)
+
+    def _ensure_indexed(self):
+        if self.assets is None:
+            with self._lock:
+                if self.assets is None:
+                    self.index()
+
+    def __contains__(self, name):
+        self._ensure_indexed()
+        return name in self.assets
+
+    def response(self, name):
+        """Response for the asset `name` (relative to the build root), or None if there is no such file."""
+        self._ensure_indexed()
+        asset = self.assets.get(name)
+        if asset is None:
+            return None
+
+        encoding = next((encoding for encoding in asset.encodings if request.accept_encodings[encoding]), None)
+        if encoding:
+            response = Response(asset.encodings[encoding], mimetype=asset.mimetype)
+            response.headers['Content-Encoding'] = encoding
+            # Each representation needs its own strong ETag
+            response.set_etag(f"{asset.etag}-{encoding}")
+            response.make_conditional(request)
+        else:
+            response = send_file(asset.path, mimetype=asset.mimetype, etag=asset.etag, conditional=True)
+        response.headers['Cache-Control'] = asset.cache_control
+        if asset.encodings:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def _load(self, name, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(name)[0]
+        if mimetype is None:
+            # Source maps are JSON
+            mimetype = 'application/json' if name.endswith('.map') else 'application/octet-stream'
+
+        # Preferred encoding first
+        encodings = {}
+        for encoding, suffix in PRECOMPRESSED.items():
+            if os.path.exists(path + suffix):
+                with open(path + suffix, 'rb') as f:
+                    encodings[encoding] = f.read()
+        if (not encodings and len(data) >= self.min_size and mimetype.startswith(COMPRESSIBLE_TYPES)
+                and not name.endswith('.map')):
+            if brotli is not None:
+                encodings['br'] = brotli.compress(data, quality=11)
+            encodings['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+        encodings = {encoding: body for encoding, body in encodings.items() if len(body) < len(data)}
+
+        hashed = name.startswith('static/') and HASHED_NAME.search(os.path.basename(name))
+        return Asset(path, mimetype, hashlib.sha256(data).hexdigest()[:32],
+                     IMMUTABLE if hashed else REVALIDATE, encodings)
@@ -0,0 +1,146 @@
+# langserver/audio.py
+import shutil
+import subprocess
+
+# Kilobits per second by [MPEG-1][bitrate index], Layer III only
+MP3_BITRATES = {
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates by version bits (MPEG-1 = 3, MPEG-2 = 2, MPEG-2.5 = 0) and rate index
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def mp3_frame_length(header):
+    """Length in bytes of the Layer III frame starting with the 4-byte `header`, or None if it isn't one."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[mpeg1][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    return (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+
+
+def _is_info_frame(frame):
+    """Whether the frame is a Xing/Info or VBRI header rather than audio."""
+    mpeg1 = (frame[1] >> 3) & 0x03 == 3
+    mono = frame[3] >> 6 == 3
+    # The Xing tag follows the side information, whose size depends on version and channels
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    return frame[4 + side_info:8 + side_info] in (b'Xing', b'Info') or frame[36:40] == b'VBRI'
+
+
+def strip_mp3(data):
+    """
+    The MPEG audio frames of an MP3, without ID3v2/ID3v1 tags or a leading
+    Xing/Info/VBRI header frame.
+
+    Those describe a whole file (its length, for seeking), so once files are
+    concatenated they are wrong and players trip over them. Data that doesn't
+    look like MP3 is returned unchanged.
+    """
+    start, end = 0, len(data)
+    if data[:3] == b'ID3' and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    if end - start >= 128 and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+
+    length = mp3_frame_length(data[start:start + 4])
+    if length and start + length <= end and _is_info_frame(data[start:start + length]):
+        start += length
+    if start == 0 and end == len(data):
+        return data
+    return data[start:end]
+
+
+def join_mp3(parts):
+    """Concatenate MP3s at frame boundaries into one stream."""
+    return b''.join(strip_mp3(part) for part in parts)
+
+
+# Formats a response can be transcoded to: MIME type, ffmpeg codec and muxer
+AUDIO_FORMATS = {
+    'mp3': {'mimetype': 'audio/mpeg', 'codec': None, 'muxer': None},
+    'opus': {'mimetype': 'audio/ogg; codecs=opus', 'codec': 'libopus', 'muxer': 'ogg'},
+    'aac': {'mimetype': 'audio/aac', 'codec': 'aac', 'muxer': 'adts'},
+}
+# Other names clients use in "format"
+FORMAT_ALIASES = {'mpeg': 'mp3', 'ogg': 'opus', 'adts': 'aac'}
+# Accept header types for each format, most specific first
+ACCEPT_TYPES = {
+    'mp3': ('audio/mpeg', 'audio/mp3'),
+    'opus': ('audio/ogg', 'audio/opus'),
+    'aac': ('audio/aac', 'audio/aacp'),
+}
+
+
+def join_audio(parts, audio_format):
+    """
+    Concatenate segment audio into one response body.
+
+    MP3 is joined at frame boundaries. ADTS frames are self-contained, and
+    Ogg streams concatenate into a chained Ogg stream, so those are joined
+    as they are.
+    """
+    if audio_format == 'mp3':
+        return join_mp3(parts)
+    return b''.join(parts)
+
+
+class Transcoder:
+    """
+    Re-encode MP3 speech to more compact formats with ffmpeg.
+
+    Each transcode is an ffmpeg process; `slots` bounds how many run at once
+    so a burst of requests for Opus can't take every core from synthesis.
+    Output is bit-exact: the same input always gives the same bytes, so
+    transcoded audio can be cached and ETags stay valid across workers.
+    """
+
+    def __init__(self, slots, binary=None, bitrates=None, timeout=30):
+        self.slots = slots
+        self.binary = binary or shutil.which('ffmpeg')
+        self.bitrates = bitrates or {}
+        self.timeout = timeout
+
+    def available(self):
+        return bool(self.binary)
+
+    def formats(self):
+        """Formats responses can be served in; only MP3 without ffmpeg."""
+        return list(AUDIO_FORMATS) if self.available() else ['mp3']
+
+    def fingerprint(self, audio_format):
+        """Identify the encoder settings for `audio_format`, for ETags."""
+        return f"{audio_format}/{AUDIO_FORMATS[audio_format]['codec']}/{self.bitrates.get(audio_format, '')}"
+
+    def transcode(self, mp3, audio_format, serial=0):
+        """
+        Return `mp3` re-encoded as `audio_format`.
+
+        `serial` seeds the Ogg stream serial number; segments that are chained
+        into one response need distinct serials.
+        """
+        spec = AUDIO_FORMATS[audio_format]
+        command = [self.binary, '-loglevel', 'error', '-f', 'mp3', '-i', 'pipe:0', '-vn', '-map_metadata', '-1',
+                   '-c:a', spec['codec']]
+        if audio_format in self.bitrates:
+            command += ['-b:a', self.bitrates[audio_format]]
+        command += ['-fflags', '+bitexact', '-flags:a', '+bitexact']
+        if spec['muxer'] == 'ogg':
+            command += ['-serial_offset', str(serial)]
+        command += ['-f', spec['muxer'], 'pipe:1']
+
+        with self.slots:
+            result = subprocess.run(command, input=mp3, capture_output=True, timeout=self.timeout)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {result.returncode}: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return result.stdout
@@ -0,0 +1,156 @@
+# langserver/audio_store.py
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+
+from .cache import normalize_text
+
+
+class AudioStore:
+    """
+    Content-addressed MP3 store on disk, shared by every worker that mounts `root`.
+
+    Files are addressed by the SHA-256 of (engine, language, text) and written
+    atomically with os.replace(), so concurrent writers of the same segment are
+    harmless. A file's mtime is refreshed on every hit and used as the LRU clock
+    when the store grows past `max_bytes`.
+    """
+
+    # Evict down to this fraction of max_bytes so eviction doesn't run on every write
+    LOW_WATERMARK = 0.9
+    # Temp files older than this were left behind by a crashed writer
+    STALE_TMP_SECONDS = 60 * 60
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = max_bytes > 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._evicting = False
+
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.root, exist_ok=True)
+        except OSError as e:
+            logging.warning(f"Audio store disabled, cannot create {self.root}: {e}")
+            self.enabled = False
+            return
+
+        # Size the existing store in the background so startup is not delayed
+        threading.Thread(target=self._evict, name='audio-store-scan', daemon=True).start()
+
+    @staticmethod
+    def digest(engine, language, text):
+        material = '\0'.join((engine, language.lower(), normalize_text(text)))
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], f"{digest}.mp3")
+
+    def get(self, digest):
+        if not self.enabled:
+            return None
+        path = self.path(digest)
+        try:
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return None
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    data = mm[:]
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"Failed to read {path} from audio store: {e}")
+            return None
+
+    def put(self, digest, data):
+        if not self.enabled or not data:
+            return
+        path = self.path(digest)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logging.warning(f"Failed to write {path} to audio store: {e}")
+            return
+
+        with self._lock:
+            self._bytes += len(data)
+            if self._bytes <= self.max_bytes or self._evicting:
+                return
+            self._evicting = True
+        threading.Thread(target=self._evict, name='audio-store-evict', daemon=True).start()
+
+    def _evict(self):
+        total = None
+        try:
+            # Only one process evicts at a time; others just resize from the scan
+            with open(os.path.join(self.root, '.evict.lock'), 'w') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                except BlockingIOError:
+                    locked = False
+
+                entries, total = self._scan(remove_stale=locked)
+                if locked and total > self.max_bytes:
+                    target = self.max_bytes * self.LOW_WATERMARK
+                    entries.sort()
+                    for _, size, path in entries:
+                        if total <= target:
+                            break
+                        try:
+                            os.unlink(path)
+                            total -= size
+                        except FileNotFoundError:
+                            total -= size
+                        except OSError as e:
+                            logging.warning(f"Failed to evict {path} from audio store: {e}")
+        except Exception as e:
+            logging.error(f"Audio store eviction failed: {e}")
+        finally:
+            with self._lock:
+                if total is not None:
+                    self._bytes = total
+                self._evicting = False
+
+    def _scan(self, remove_stale=False):
+        entries = []
+        total = 0
+        now = time.time()
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.startswith('.tmp-'):
+                    if remove_stale and now - stat.st_mtime > self.STALE_TMP_SECONDS:
+                        try:
+                            os.unlink(entry.path)
+                        except OSError:
+                            pass
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        return entries, total
@@ -0,0 +1,105 @@
+# langserver/auth.py
+import logging
+import threading
+import time
+from collections import namedtuple
+from sqlalchemy import update
+from . import db
+from .cache import LRUCache
+from .models import APIToken, CacheVersion
+
+TokenInfo = namedtuple('TokenInfo', ['id', 'rate_limit'])
+
+# Name of the CacheVersion row shared by every worker's token cache
+VERSION_NAME = 'api_tokens'
+
+
+class TokenCache:
+    """
+    In-process cache of hashed token -> TokenInfo for require_token.
+
+    Unknown tokens are cached too, in a separate LRU of `negative_entries`
+    (by default a tenth of `max_entries`), so repeated bad tokens don't reach
+    the database either and a flood of random ones can't evict valid tokens. Mutations call invalidate(), which
+    drops local entries and bumps a CacheVersion row; other workers compare
+    that row at most once per `sync_interval` seconds and clear their caches
+    when it moves.
+
+    Must be called inside an app context.
+    """
+
+    def __init__(self, max_entries, ttl, negative_ttl, negative_entries=None, sync_interval=1):
+        self.positive = LRUCache(max_entries, ttl=ttl, sizeof=lambda _: 1)
+        negative_entries = negative_entries or max(1, max_entries // 10)
+        self.negative = LRUCache(negative_entries, ttl=negative_ttl, sizeof=lambda _: 1)
+        self.sync_interval = sync_interval
+        self._version = None
+        self._next_sync = 0
+        self._hash_by_id = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, hashed_token):
+        self._sync()
+
+        info = self.positive.get(hashed_token)
+        if info is not None:
+            return info
+        if self.negative.get(hashed_token) is not None:
+            return None
+
+        record = APIToken.query.filter_by(token=hashed_token).first()
+        if not record:
+            self.negative.set(hashed_token, True)
+            return None
+
+        info = TokenInfo(record.id, record.rate_limit)
+        self.positive.set(hashed_token, info)
+        with self._lock:
+            self._hash_by_id[record.id] = hashed_token
+        return info
+
+    def invalidate(self, token_id=None, hashed_token=None):
+        """Drop the entries for a token (by id and/or hash) here and, via the version row, in every worker."""
+        with self._lock:
+            if token_id is not None:
+                hashed_token_for_id = self._hash_by_id.pop(token_id, None)
+                if hashed_token_for_id:
+                    self.positive.delete(hashed_token_for_id)
+        if hashed_token is not None:
+            self.positive.delete(hashed_token)
+            self.negative.delete(hashed_token)
+
+        try:
+            result = db.session.execute(
+                update(CacheVersion).where(CacheVersion.name == VERSION_NAME).values(version=CacheVersion.version + 1)
+            )
+            if result.rowcount == 0:
+                db.session.add(CacheVersion(name=VERSION_NAME, version=1))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            # Other workers fall back to the TTL
+            logging.error(f"Failed to publish token cache invalidation: {e}")
+
+    def clear(self):
+        self.positive.clear()
+        self.negative.clear()
+        with self._lock:
+            self._hash_by_id.clear()
+
+    def _sync(self):
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        self._next_sync = now + self.sync_interval
+
+        try:
+            record = db.session.get(CacheVersion, VERSION_NAME)
+        except Exception as e:
+            logging.warning(f"Failed to read token cache version: {e}")
+            return
+        version = record.version if record else 0
+        if version != self._version:
+            if self._version is not None:
+                self.clear()
+            self._version = version
@@ -0,0 +1,132 @@
+# langserver/cli.py
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from . import app
+from .routes import plan_segments, synthesize_segment
+
+
+def record_key(payload):
+    """
+    Identify a record for resuming: its "id" when it has one, otherwise a
+    digest of its content, so edits elsewhere in the file don't shift it.
+    """
+    if isinstance(payload, dict) and payload.get('id') is not None:
+        return f"id:{payload['id']}"
+    content = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:32]
+
+
+def read_vocabulary(path):
+    """
+    Yield (line number, key, payload) for each record in a vocabulary file.
+
+    .jsonl files hold one /generate-speech payload per line; lines that
+    aren't a JSON object are reported and skipped. CSV files either have
+    text, language and translations columns (translations separated by "|"),
+    or one column per language code whose cells form a localization map.
+    """
+    if path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    payload = json.loads(line)
+                except ValueError as e:
+                    click.echo(f"Line {number}: skipped, invalid JSON: {e}", err=True)
+                    continue
+                if not isinstance(payload, dict):
+                    click.echo(f"Line {number}: skipped, not a JSON object", err=True)
+                    continue
+                yield number, record_key(payload), payload
+        return
+
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            # Report the physical line, which differs from the row count with quoted newlines
+            number = reader.line_num
+            if 'text' in row and 'language' in row:
+                translations = [code.strip() for code in (row.get('translations') or '').split('|') if code.strip()]
+                payload = {'text': row['text'], 'language': row['language'], 'translations': translations}
+            else:
+                payload = {'localization': {code: text for code, text in row.items() if code and text}}
+            yield number, record_key(payload), payload
+
+
+"""
+Pre-warm the audio store and translation cache from a vocabulary file.
+
+Example:
+    flask warm-cache vocabulary.jsonl --concurrency 16
+
+Progress is appended to a state file (default <file>.progress) so an
+interrupted run resumes where it stopped; records already warmed are
+skipped, matched by their "id" or content rather than their position.
+Malformed lines are reported and skipped. Upstream calls are still capped by TTS_CONCURRENCY and
+TRANSLATE_CONCURRENCY.
+"""
+@app.cli.command('warm-cache')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--concurrency', default=8, show_default=True, help='Records warmed in parallel.')
+@click.option('--state', 'state_path', default=None, help='Progress file used to resume (default: PATH.progress).')
+@click.option('--report-every', default=100, show_default=True, help='Print progress every N records.')
+def warm_cache(path, concurrency, state_path, report_every):
+    state_path = state_path or f'{path}.progress'
+    done = set()
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            done = {line.strip() for line in f if line.strip()}
+
+    records = [record for record in read_vocabulary(path) if record[1] not in done]
+    click.echo(f"Warming {len(records)} records ({len(done)} already done) with concurrency {concurrency}")
+
+    lock = threading.Lock()
+    totals = {'records': 0, 'segments': 0, 'failed': 0}
+    started = time.monotonic()
+
+    def warm(record):
+        number, key, payload = record
+        try:
+            segments = plan_segments(payload)
+        except (ValueError, AttributeError, TypeError) as e:
+            click.echo(f"Record {number}: {e}", err=True)
+            segments = []
+
+        failed = 0
+        for segment in segments:
+            try:
+                synthesize_segment(segment)
+            except Exception as e:
+                failed += 1
+                click.echo(f"Record {number} ({segment.language}): {e}", err=True)
+
+        with lock:
+            totals['records'] += 1
+            totals['segments'] += len(segments) - failed
+            totals['failed'] += failed
+            # Records with failures are retried on the next run
+            if not failed:
+                state.write(f"{key}\n")
+                state.flush()
+            if totals['records'] % report_every == 0:
+                report()
+
+    def report():
+        elapsed = time.monotonic() - started
+        click.echo(
+            f"{totals['records']}/{len(records)} records, {totals['segments']} segments, "
+            f"{totals['failed']} failed, {totals['segments'] / elapsed if elapsed else 0:.1f} segments/s"
+        )
+
+    with open(state_path, 'a') as state, ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(warm, records))
+    report()
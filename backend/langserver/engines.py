@@ -0,0 +1,199 @@
+# langserver/engines.py
+import logging
+import os
+import shutil
+import subprocess
+import threading
+
+from gtts import lang, __version__ as gtts_version
+from .languages import normalize_code
+
+
+class TTSEngine:
+    """
+    A speech synthesizer that turns (language, text) into MP3 bytes.
+
+    `slots` caps how many syntheses run at once. `name` keys the engine's
+    audio in the audio store and `version` goes into ETags, so clients
+    revalidate after an engine upgrade.
+    """
+
+    name = None
+    version = ''
+
+    def __init__(self, slots):
+        self.slots = slots
+
+    def languages(self):
+        """Lower-cased language codes this engine can speak."""
+        raise NotImplementedError
+
+    def language_names(self):
+        """Display names keyed by the engine's own spelling of each code."""
+        return {code: code for code in self.languages()}
+
+    def available(self):
+        return True
+
+    def supports(self, language):
+        return language.lower() in self.languages()
+
+    def split_text(self, language, text):
+        """Split text into the pieces this engine synthesizes separately."""
+        return [text]
+
+    def synthesize(self, language, text):
+        raise NotImplementedError
+
+
+class GTTSEngine(TTSEngine):
+    """Google Translate's TTS endpoint, called through the resilient upstream client."""
+
+    name = 'gtts'
+    version = gtts_version
+
+    def __init__(self, upstream, caller, slots):
+        super().__init__(slots)
+        self.upstream = upstream
+        self.caller = caller
+        self._names = lang.tts_langs()
+        self._languages = frozenset(code.lower() for code in self._names)
+
+    def languages(self):
+        return self._languages
+
+    def language_names(self):
+        return self._names
+
+    def available(self):
+        # While Google throttles us the breaker is open and other engines take over
+        return self.caller.breaker.state != 'open'
+
+    def split_text(self, language, text):
+        return self.upstream.split_text(language, text)
+
+    def synthesize(self, language, text):
+        return self.caller.call(self.upstream.synthesize, language, text)
+
+
+# gTTS codes that espeak-ng knows under another voice name
+ESPEAK_ALIASES = {
+    'zh': 'cmn',
+    'zh-cn': 'cmn',
+    'zh-tw': 'cmn',
+    'fr-ca': 'fr',
+    'pt-pt': 'pt',
+    'jw': 'jv',
+}
+
+
+class EspeakEngine(TTSEngine):
+    """
+    Offline synthesis with the espeak-ng (or espeak) binary on the local CPU.
+
+    espeak writes WAV to stdout, which lame or ffmpeg encodes to MP3. The voice
+    list is read once at startup; `slots` bounds concurrent processes to the
+    CPU count so a burst can't fork-bomb the host.
+    """
+
+    name = 'espeak'
+
+    def __init__(self, slots, binary=None, encoder=None, timeout=30):
+        super().__init__(slots)
+        self.binary = binary or shutil.which('espeak-ng') or shutil.which('espeak')
+        self.encoder = encoder or shutil.which('lame') or shutil.which('ffmpeg')
+        self.timeout = timeout
+        self._voices = {}
+        if self.binary and self.encoder:
+            try:
+                self.version = self._run([self.binary, '--version']).decode('utf-8', 'replace').strip()
+                self._voices = self._read_voices()
+            except (OSError, subprocess.SubprocessError) as e:
+                logging.error(f"Disabling espeak engine, {self.binary} failed: {e}")
+                self.binary = None
+
+    def languages(self):
+        return self._voices.keys()
+
+    def available(self):
+        return bool(self.binary and self.encoder)
+
+    def voice(self, language):
+        return self._voices[language.lower()]
+
+    def synthesize(self, language, text):
+        wav = self._run([self.binary, '-v', self.voice(language), '--stdout'], stdin=text.encode('utf-8'))
+        return self._run(self._encode_command(), stdin=wav)
+
+    def _encode_command(self):
+        if os.path.basename(self.encoder).startswith('ffmpeg'):
+            return [self.encoder, '-loglevel', 'error', '-i', 'pipe:0', '-f', 'mp3', 'pipe:1']
+        return [self.encoder, '--quiet', '-', '-']
+
+    def _read_voices(self):
+        """Map every language code we accept to the espeak voice that speaks it."""
+        # Columns: Pty Language Age/Gender VoiceName File Other Languages
+        output = self._run([self.binary, '--voices']).decode('utf-8', 'replace')
+        voices = {}
+        for line in output.splitlines()[1:]:
+            columns = line.split()
+            if len(columns) > 1:
+                voice = columns[1].lower()
+                voices[voice] = voice
+                # en-gb also answers for plain en unless a voice named en exists
+                voices.setdefault(voice.split('-', 1)[0], voice)
+        for alias, voice in ESPEAK_ALIASES.items():
+            if voice in voices:
+                voices.setdefault(alias, voices[voice])
+        return voices
+
+    def _run(self, command, stdin=None):
+        result = subprocess.run(command, input=stdin, capture_output=True, timeout=self.timeout)
+        if result.returncode != 0:
+            raise RuntimeError(f"{command[0]} exited with {result.returncode}: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return result.stdout
+
+
+class EngineRouter:
+    """
+    Pick the TTS engine for each language.
+
+    Languages pinned in `pins` (language -> engine name) always use that
+    engine while it is available. Otherwise the available engines that support
+    the language are ordered by an exponentially weighted moving average of
+    their recent latency, so the fastest one is tried first; engines without
+    samples yet come first so each gets measured.
+    """
+
+    def __init__(self, engines, pins=None, alpha=0.2):
+        self.engines = list(engines)
+        self.pins = {normalize_code(language): name.strip().lower() for language, name in (pins or {}).items()}
+        self.alpha = alpha
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def candidates(self, language):
+        """Available engines for `language`, best first."""
+        engines = [engine for engine in self.engines if engine.available() and engine.supports(language)]
+        with self._lock:
+            engines.sort(key=lambda engine: self._latency.get(engine.name, 0))
+        pinned = self.pins.get(normalize_code(language))
+        engines.sort(key=lambda engine: engine.name != pinned)
+        return engines
+
+    def supports(self, language):
+        return any(engine.supports(language) for engine in self.engines)
+
+    def supporting(self, language):
+        """Every configured engine that can speak `language`, available or not."""
+        return [engine for engine in self.engines if engine.supports(language)]
+
+    def record(self, engine, seconds):
+        with self._lock:
+            previous = self._latency.get(engine.name)
+            self._latency[engine.name] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def fingerprint(self):
+        """Identify the configured engines and versions, for ETags."""
+        return ';'.join(f"{engine.name}/{engine.version}" for engine in self.engines)
+
@@ -0,0 +1,161 @@
+# langserver/jobs.py
+import json
+import logging
+import queue
+import time
+import uuid
+from functools import partial
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from . import db
+from .audio import strip_mp3
+from .models import SpeechJob
+from .scheduler import SchedulerBusy
+from .threads import BackgroundThreads
+
+
+class JobRunner:
+    """
+    Background runner for speech jobs persisted in the SpeechJob table.
+
+    submit() stores a queued job and hands its id to a local runner thread.
+    Threads claim jobs with a conditional UPDATE, so any worker process may
+    run any job exactly once. Idle threads poll the table for queued jobs,
+    which picks up jobs submitted before a restart or by other processes, and
+    requeue running jobs whose owner stopped updating them.
+
+    `plan` turns a payload into segments and `synthesize(segment, token_id=)`
+    turns one segment into MP3 bytes, accounting it to the job's token;
+    segments run on the shared speech scheduler.
+    """
+
+    def __init__(self, app, scheduler, plan, synthesize, workers=2, poll_interval=5,
+                 stale_after=300, retention=24 * 60 * 60):
+        self.app = app
+        self.scheduler = scheduler
+        self.plan = plan
+        self.synthesize = synthesize
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.retention = retention
+        self._queue = queue.Queue()
+        self._threads = BackgroundThreads(self._work, 'speech-job', count=workers, on_start=self._reset)
+
+    def submit(self, payload, token_id=None):
+        """Validate and persist a job, returning its id. Raises ValueError for an invalid payload."""
+        segments = self.plan(payload)
+        if not segments:
+            raise ValueError("No supported languages in payload")
+
+        job = SpeechJob(
+            id=uuid.uuid4().hex,
+            token_id=token_id,
+            payload=json.dumps(payload),
+            segments=json.dumps([{'language': segment.language, 'status': 'queued'} for segment in segments]),
+            total=len(segments),
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        self.start()
+        self._queue.put(job.id)
+        return job.id
+
+    def start(self):
+        """Start the runner threads in this process if they aren't running yet."""
+        self._threads.start()
+
+    def _reset(self):
+        # Ids queued in the parent process are found again by polling
+        self._queue = queue.Queue()
+
+    def _work(self):
+        while True:
+            try:
+                job_id = self._queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                job_id = None
+
+            try:
+                with self.app.app_context():
+                    if job_id is None:
+                        job_id = self._find_queued_job()
+                    if job_id is not None and self._claim(job_id):
+                        self._run(job_id)
+            except Exception as e:
+                logging.error(f"Speech job {job_id} crashed: {e}")
+
+    def _find_queued_job(self):
+        # Every idle thread polls, so only write when a read finds something to change
+        now = datetime.utcnow()
+        stale = SpeechJob.query.filter(
+            SpeechJob.status == 'running',
+            SpeechJob.date_updated < now - timedelta(seconds=self.stale_after),
+        )
+        expired = SpeechJob.query.filter(
+            SpeechJob.status.in_(('done', 'failed')),
+            SpeechJob.date_updated < now - timedelta(seconds=self.retention),
+        )
+        if db.session.query(stale.exists()).scalar():
+            stale.update({'status': 'queued'}, synchronize_session=False)
+            db.session.commit()
+        if db.session.query(expired.exists()).scalar():
+            expired.delete(synchronize_session=False)
+            db.session.commit()
+
+        job = SpeechJob.query.filter_by(status='queued').order_by(SpeechJob.date_created).first()
+        return job.id if job else None
+
+    def _claim(self, job_id):
+        result = db.session.execute(
+            update(SpeechJob)
+            .where(SpeechJob.id == job_id, SpeechJob.status == 'queued')
+            .values(status='running', date_updated=datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _run(self, job_id):
+        job = db.session.get(SpeechJob, job_id)
+        segments = self.plan(json.loads(job.payload))
+        progress = [{'language': segment.language, 'status': 'queued'} for segment in segments]
+        job.total, job.completed, job.failed = len(segments), 0, 0
+
+        audio = bytearray()
+        for index, future in enumerate(self._futures(segments, job.token_id)):
+            try:
+                audio += strip_mp3(future.result())
+                progress[index]['status'] = 'done'
+                job.completed += 1
+            except Exception as e:
+                progress[index].update(status='failed', error=str(e))
+                job.failed += 1
+            job.segments = json.dumps(progress)
+            job.date_updated = datetime.utcnow()
+            db.session.commit()
+
+        if audio:
+            job.result = bytes(audio)
+            job.status = 'done'
+        else:
+            job.status = 'failed'
+            job.error = 'All segments failed'
+        job.date_updated = datetime.utcnow()
+        db.session.commit()
+        logging.info(f"Speech job {job_id} {job.status}: {job.completed}/{job.total} segments")
+
+    def _futures(self, segments, token_id):
+        # Jobs larger than the scheduler queue are fed to it one queue-sized slice at a time
+        step = self.scheduler.max_queue
+        for start in range(0, len(segments), step):
+            yield from self._submit(segments[start:start + step], token_id)
+
+    def _submit(self, segments, token_id):
+        # Jobs wait for room in the scheduler instead of failing like interactive requests
+        synthesize = partial(self.synthesize, token_id=token_id)
+        while True:
+            try:
+                return self.scheduler.submit_group(synthesize, segments)
+            except SchedulerBusy as e:
+                time.sleep(e.retry_after)
@@ -0,0 +1,107 @@
+# langserver/languages.py
+import importlib.util
+import os
+import sys
+import threading
+
+# Codes clients commonly send for languages Google knows under another code
+ALIASES = {
+    'zh': 'zh-CN',
+    'zh-hans': 'zh-CN',
+    'zh-hant': 'zh-TW',
+    'he': 'iw',
+    'jv': 'jw',
+    'fil': 'tl',
+    'nb': 'no',
+}
+
+
+def normalize_code(code):
+    """Case- and separator-insensitive form of a language code: zh_TW -> zh-tw."""
+    return code.strip().lower().replace('_', '-')
+
+
+def translation_languages():
+    """
+    googletrans' table of language codes and names.
+
+    googletrans/__init__ imports its client and httpx, which is most of the
+    cost of importing it, so the constants module is loaded on its own unless
+    googletrans is already imported.
+    """
+    if 'googletrans.constants' in sys.modules:
+        return sys.modules['googletrans.constants'].LANGUAGES
+    package = importlib.util.find_spec('googletrans')
+    spec = importlib.util.spec_from_file_location(
+        'langserver._googletrans_constants', os.path.join(os.path.dirname(package.origin), 'constants.py')
+    )
+    constants = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(constants)
+    return constants.LANGUAGES
+
+
+class LanguageRegistry:
+    """
+    Index of the language codes we can speak and translate.
+
+    Built once from the configured TTS engines and googletrans' language
+    table, then every lookup is a dict hit. Codes are matched regardless of
+    case or separator and common aliases are accepted; lookups return the
+    canonical code to send upstream, or None if unsupported. The index is
+    built on first use, and only reads googletrans' language table, so its
+    HTTP client isn't imported until a translation is requested; /readyz
+    builds it before traffic arrives.
+    """
+
+    def __init__(self, engines):
+        self.engines = engines
+        self._tts = None
+        self._translation = None
+        self._names = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._tts is not None
+
+    def build(self):
+        if self._tts is not None:
+            return
+        with self._lock:
+            if self._tts is not None:
+                return
+            # The first engine to list a language decides its canonical code
+            tts_names, seen = {}, set()
+            for engine in self.engines:
+                for code, name in engine.language_names().items():
+                    if normalize_code(code) not in seen:
+                        seen.add(normalize_code(code))
+                        tts_names[code] = name
+            translation_names = {code: name.title() for code, name in translation_languages().items()}
+
+            self._names = {'tts': tts_names, 'translation': translation_names}
+            self._translation = self._index(translation_names)
+            self._tts = self._index(tts_names)
+
+    def tts(self, code):
+        """Canonical TTS code for `code`, or None."""
+        self.build()
+        return self._tts.get(normalize_code(code))
+
+    def translation(self, code):
+        """Canonical translation code for `code`, or None."""
+        self.build()
+        return self._translation.get(normalize_code(code))
+
+    def catalog(self):
+        """Supported codes and their display names, keyed by capability."""
+        self.build()
+        return self._names
+
+    @staticmethod
+    def _index(names):
+        index = {normalize_code(code): code for code in names}
+        for alias, code in ALIASES.items():
+            if normalize_code(code) in index:
+                index.setdefault(alias, index[normalize_code(code)])
+        return index
@@ -0,0 +1,62 @@
+# langserver/metrics.py
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
+
+# Upstream calls and segment synthesis take tens of milliseconds to seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram('langserver_request_duration_seconds', 'HTTP request latency',
+                            ['endpoint', 'status'], buckets=LATENCY_BUCKETS)
+RESPONSE_BYTES = Counter('langserver_response_bytes_total', 'Response body bytes sent', ['endpoint'])
+AUTH_LATENCY = Histogram('langserver_auth_duration_seconds', 'Time spent authenticating tokens',
+                         buckets=LATENCY_BUCKETS)
+TRANSLATE_LATENCY = Histogram('langserver_translate_duration_seconds', 'Upstream translate call latency',
+                              buckets=LATENCY_BUCKETS)
+TTS_LATENCY = Histogram('langserver_tts_duration_seconds', 'TTS engine call latency per engine and language',
+                        ['engine', 'language'], buckets=LATENCY_BUCKETS)
+TRANSCODE_LATENCY = Histogram('langserver_transcode_duration_seconds', 'Time spent transcoding a segment per format',
+                              ['format'], buckets=LATENCY_BUCKETS)
+CACHE_LOOKUPS = Counter('langserver_cache_lookups_total', 'Cache lookups by cache and result', ['cache', 'result'])
+COALESCED_CALLS = Counter('langserver_coalesced_calls_total', 'Calls that joined an identical in-flight call')
+UPSTREAM_ERRORS = Counter('langserver_upstream_errors_total', 'Failed upstream calls; kind is throttled or error',
+                          ['service', 'kind'])
+UPSTREAM_RETRIES = Counter('langserver_upstream_retries_total', 'Upstream calls retried after a transient error',
+                           ['service'])
+UPSTREAM_HEDGES = Counter('langserver_upstream_hedges_total', 'Duplicate upstream calls started for slow requests',
+                          ['service'])
+CIRCUIT_OPENED = Counter('langserver_circuit_opened_total', 'Times an upstream circuit breaker opened', ['service'])
+QUEUE_DEPTH = Gauge('langserver_scheduler_queue_depth', 'Speech tasks waiting for a worker',
+                    multiprocess_mode='livesum')
+QUEUE_WAIT = Histogram('langserver_scheduler_wait_seconds', 'Time speech tasks wait for a worker',
+                       buckets=LATENCY_BUCKETS)
+
+
+def cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+@contextmanager
+def timed(histogram, trace=None, **labels):
+    """Observe the duration of the block in `histogram`, and log it at debug level when `trace` names the stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        (histogram.labels(**labels) if labels else histogram).observe(elapsed)
+        if trace and logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"trace {trace}: {elapsed * 1000:.1f} ms")
+
+
+def render():
+    """Render all metrics in Prometheus text format, merging every worker when multiprocess mode is on."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
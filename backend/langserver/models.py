@@ -18,3 +18,56 @@ class APIToken(db.Model):
 
     def __repr__(self):
         return f'<APIToken {self.id}>'
+
+class Translation(db.Model):
+    # SHA-256 of (src, dest, normalized text); the text itself can exceed index limits
+    key = db.Column(db.String(64), primary_key=True)
+    src = db.Column(db.String(16), nullable=False)
+    dest = db.Column(db.String(16), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    translation = db.Column(db.Text, nullable=False)
+    date_created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Translation {self.src}>{self.dest} {self.key[:12]}>'
+
+class CacheVersion(db.Model):
+    # Bumped whenever cached data changes so other workers know to drop their copies
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.name}={self.version}>'
+
+class SpeechJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    # None for jobs submitted with the admin token
+    token_id = db.Column(db.String(80), nullable=True, index=True)
+    # queued -> running -> done | failed
+    status = db.Column(db.String(16), nullable=False, default='queued', index=True)
+    payload = db.Column(db.Text, nullable=False)
+    # JSON list of {"language", "status", "error"} in request order
+    segments = db.Column(db.Text, nullable=False, default='[]')
+    total = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    result = db.deferred(db.Column(db.LargeBinary, nullable=True))
+    date_created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    date_updated = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SpeechJob {self.id} {self.status}>'
+
+class TokenUsage(db.Model):
+    # One row per token per time bucket; counters are added to by batched upserts
+    token_id = db.Column(db.String(80), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    requests = db.Column(db.BigInteger, nullable=False, default=0)
+    segments = db.Column(db.BigInteger, nullable=False, default=0)
+    characters = db.Column(db.BigInteger, nullable=False, default=0)
+    cache_hits = db.Column(db.BigInteger, nullable=False, default=0)
+    bytes_served = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TokenUsage {self.token_id} {self.bucket}>'
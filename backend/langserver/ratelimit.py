@@ -0,0 +1,116 @@
+# langserver/ratelimit.py
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+"""
+Outcome of a rate limit check. `reset` is the Unix time at which the bucket
+is full again and `retry_after` the seconds until the next request would be
+allowed (0 when this one was).
+"""
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'reset', 'retry_after'])
+
+
+def _take(tokens, updated, capacity, now):
+    """Refill a per-minute token bucket up to `now` and try to take one token from it."""
+    refill_rate = capacity / 60.0
+    if tokens is None:
+        tokens = float(capacity)
+    else:
+        tokens = min(float(capacity), tokens + (now - updated) * refill_rate)
+
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    return allowed, tokens
+
+
+class MemoryBucketStorage:
+    """Token buckets in this process only; each worker enforces the limit separately."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            allowed, tokens = _take(tokens, updated, capacity, now)
+            self._buckets[key] = (tokens, now)
+        return allowed, tokens
+
+
+class SQLiteBucketStorage:
+    """
+    Token buckets in a SQLite file, shared by every worker process on the node.
+
+    Each check is a single BEGIN IMMEDIATE transaction on a WAL database, so
+    concurrent workers serialize on the bucket row without blocking readers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+        finally:
+            conn.close()
+
+    def take(self, key, capacity, now):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (None, now)
+            allowed, tokens = _take(tokens, updated, capacity, now)
+            conn.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, tokens
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+
+class TokenRateLimiter:
+    """Per-token limiter enforcing APIToken.rate_limit requests per minute with a token bucket."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def hit(self, token_id, limit):
+        now = time.time()
+        if limit <= 0:
+            return RateLimitResult(False, limit, 0, int(now), 60)
+
+        allowed, tokens = self.storage.take(str(token_id), limit, now)
+        refill_rate = limit / 60.0
+        reset = int(math.ceil(now + (limit - tokens) / refill_rate))
+        retry_after = 0 if allowed else int(math.ceil((1 - tokens) / refill_rate))
+        return RateLimitResult(allowed, limit, int(tokens), reset, retry_after)
+
+    @staticmethod
+    def headers(result):
+        headers = {
+            'X-RateLimit-Limit': str(result.limit),
+            'X-RateLimit-Remaining': str(result.remaining),
+            'X-RateLimit-Reset': str(result.reset),
+        }
+        if not result.allowed:
+            headers['Retry-After'] = str(result.retry_after)
+        return headers
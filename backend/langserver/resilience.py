@@ -0,0 +1,178 @@
+# langserver/resilience.py
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from . import metrics
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream that is currently failing."""
+
+
+class UpstreamThrottled(Exception):
+    """Raised when Google answers 429/503; retrying would only prolong the throttling."""
+
+
+class CircuitBreaker:
+    """
+    Fail fast after `failure_threshold` consecutive upstream failures.
+
+    Once open, calls are rejected for `reset_timeout` seconds; then a single
+    trial call is let through and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.reset_timeout and not self._trial_running:
+                self._trial_running = True
+                return
+        raise CircuitOpen(f"{self.name} circuit is open after repeated upstream failures")
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_running:
+                    metrics.CIRCUIT_OPENED.labels(self.name).inc()
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+
+class LatencyTracker:
+    """Rolling window of recent call durations."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction, min_samples=20):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class ResilientCaller:
+    """
+    Wrap upstream calls with a deadline, jittered retries, hedging and a circuit breaker.
+
+    Each attempt runs on a small hedge pool and is abandoned after `deadline`
+    seconds. If an attempt is still running after the recent p95 latency, a
+    duplicate is started and whichever finishes first wins. Failed attempts
+    are retried up to `retries` times with full-jitter exponential backoff.
+    Exceptions in `permanent` (bad input) are raised immediately and don't
+    count against the breaker; throttling is never retried and counts.
+    Each call() records one outcome on the breaker, so wrap one upstream
+    request per call.
+
+    `slots` is the semaphore capping upstream concurrency. Callers hold one
+    slot for the primary attempt; a hedge takes another without waiting and
+    is skipped when none is free, so hedging never exceeds the cap.
+    """
+
+    def __init__(self, name, breaker, deadline, retries=2, backoff=0.2, hedge=True,
+                 hedge_min_delay=0.1, hedge_workers=16, permanent=(ValueError,), slots=None):
+        self.name = name
+        self.breaker = breaker
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.permanent = permanent
+        self.slots = slots
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(hedge_workers, thread_name_prefix=f'{name}-hedge')
+
+    def call(self, fn, *args):
+        self.breaker.allow()
+        for attempt in range(self.retries + 1):
+            try:
+                result = self._attempt(fn, args)
+            except self.permanent:
+                self.breaker.record_success()
+                raise
+            except UpstreamThrottled:
+                self.breaker.record_failure()
+                raise
+            except Exception:
+                if attempt == self.retries:
+                    self.breaker.record_failure()
+                    raise
+                metrics.UPSTREAM_RETRIES.labels(self.name).inc()
+                time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+            else:
+                self.breaker.record_success()
+                return result
+
+    def _attempt(self, fn, args):
+        started = time.monotonic()
+        deadline = started + self.deadline
+        attempts = {self._executor.submit(fn, *args)}
+
+        hedge_delay = self.latency.percentile(0.95) if self.hedge else None
+        if hedge_delay is not None:
+            done, _ = wait(attempts, timeout=max(hedge_delay, self.hedge_min_delay))
+            hedge = None if done else self._hedge(fn, args)
+            if hedge is not None:
+                metrics.UPSTREAM_HEDGES.labels(self.name).inc()
+                attempts.add(hedge)
+
+        error = None
+        while attempts:
+            done, attempts = wait(attempts, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"{self.name} call exceeded {self.deadline:.1f}s deadline")
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                self.latency.record(time.monotonic() - started)
+                return result
+        raise error
+
+    def _hedge(self, fn, args):
+        """Start a duplicate attempt under its own slot, or return None if no slot is free."""
+        if self.slots is None:
+            return self._executor.submit(fn, *args)
+        if not self.slots.acquire(blocking=False):
+            return None
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
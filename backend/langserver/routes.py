@@ -1,27 +1,35 @@
 # langserver/routes.py
-from googletrans import Translator, LANGUAGES
-from gtts import gTTS, lang
-import os
 import re
 import io
 import base64
 import datetime
 import string
 import secrets
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, Response, request, jsonify, send_file
 from flask_sqlalchemy import SQLAlchemy
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
-from functools import wraps
+from functools import wraps, partial
 import logging
 from logging.handlers import RotatingFileHandler
-from . import app, limiter, db
-from .models import APIToken
+from . import app, limiter, db, segment_cache, audio_store, translation_cache, speech_scheduler, token_cache, token_rate_limiter, inflight, translation_batcher, tts_router, language_registry, usage_recorder, transcoder, admin_assets
+from .audio import AUDIO_FORMATS, ACCEPT_TYPES, FORMAT_ALIASES, join_audio, strip_mp3
+from .cache import normalize_text, segment_key
+from .models import APIToken, SpeechJob, TokenUsage
+from .jobs import JobRunner
+from .usage import COUNTERS as USAGE_COUNTERS
+from . import metrics
+import time
+from .scheduler import SchedulerBusy
 import hashlib
-from flask import current_app
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app, g, stream_with_context
+from sqlalchemy import insert
+import threading
 import traceback
+import json
+import zipfile
+from collections import namedtuple
 
 
 """
@@ -44,6 +52,68 @@ def health_check():
         current_app.logger.error(f"Health check failed: {e}")
         return jsonify({"status": "unhealthy", "details": str(e)}), 500
 
+"""
+Report whether this worker is ready for traffic.
+
+Builds the language registry (importing googletrans) on the first call, so a
+readiness probe warms the worker before it receives requests, then checks the
+database. Engine availability is reported but doesn't affect the status: while
+an upstream is throttled, cached audio and every other endpoint still work,
+and taking every worker out of rotation would only make that worse.
+
+Returns:
+    200 with {"status": "ready", "engines": {"gtts": true, ...}}, or 503 with
+    {"status": "not ready", "details": ...}.
+"""
+@app.route('/readyz', methods=['GET'])
+@limiter.exempt
+def readiness_check():
+    try:
+        language_registry.build()
+        db.session.execute(db.text('SELECT 1'))
+    except Exception as e:
+        current_app.logger.error(f"Readiness check failed: {e}")
+        return jsonify({"status": "not ready", "details": str(e)}), 503
+    engines = {engine.name: engine.available() for engine in tts_router.engines}
+    return jsonify({"status": "ready", "engines": engines}), 200
+
+"""
+List the languages that can be spoken and translated.
+
+Returns:
+    {"tts": {"en": "English", "zh-TW": "Chinese (Mandarin/Taiwan)", ...},
+     "translation": {"en": "English", "zh-tw": "Chinese (Traditional)", ...}}
+    Codes are accepted case-insensitively, with "_" or "-" separators.
+"""
+@app.route('/languages', methods=['GET'])
+@limiter.exempt
+def list_languages():
+    response = jsonify(language_registry.catalog())
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+"""
+Expose Prometheus metrics.
+
+Returns:
+    All counters and histograms in Prometheus text format. When
+    PROMETHEUS_MULTIPROC_DIR is set, values are aggregated across every worker
+    process that shares the directory.
+"""
+@app.route('/metrics', methods=['GET'])
+@limiter.exempt
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+"""
+Tell clients to back off when the shared speech pool cannot take more work.
+"""
+@app.errorhandler(SchedulerBusy)
+def handle_scheduler_busy(e):
+    current_app.logger.warning("Speech scheduler queue full, rejecting request")
+    return jsonify({'error': 'Server busy, please retry later'}), 503, {'Retry-After': str(e.retry_after)}
+
 """
 Decorator to require an API token for access to the decorated function.
 
@@ -64,44 +134,116 @@ def require_token(f):
             current_app.logger.warning("Missing Authorization header")
             return jsonify({'error': 'Unauthorized access'}), 401
         
-        # Hash the incoming token
-        admin_token = current_app.config.get('ADMIN_TOKEN')
-        hashed_incoming_token = APIToken.hash_token(incoming_token, admin_token)
-
         # Check if the provided token is the admin token
+        admin_token = current_app.config.get('ADMIN_TOKEN')
         if incoming_token == admin_token:
+            g.token_id = None
             return f(*args, **kwargs)
 
-        # Retrieve the token record using the hashed token
-        token_record = APIToken.query.filter_by(token=hashed_incoming_token).first()
+        # Hash the incoming token and resolve it through the token cache
+        with metrics.timed(metrics.AUTH_LATENCY, trace='auth'):
+            hashed_incoming_token = APIToken.hash_token(incoming_token, admin_token)
+            token_record = token_cache.lookup(hashed_incoming_token)
         if not token_record:
             current_app.logger.warning(f"Invalid token attempted: {incoming_token}")
             return jsonify({'error': 'Unauthorized access'}), 401
 
+        g.token_id = token_record.id
+
         # Apply rate limit based on the token's rate limit setting
-        limiter.limit(f"{token_record.rate_limit} per minute")(f)
+        g.token_rate_limit = token_rate_limiter.hit(token_record.id, token_record.rate_limit)
+        if not g.token_rate_limit.allowed:
+            current_app.logger.info(f"Rate limit exceeded for token ID: {token_record.id}")
+            return jsonify({'error': 'Rate limit exceeded'}), 429
         return f(*args, **kwargs)
     return decorated_function
 
+"""
+Rate-limit key for token-authenticated routes: a digest of the presented
+credential, so clients behind one IP don't share a limit. Token routes list
+their limiter decorators above @require_token, so these limits are checked
+before the request is charged to the token's own bucket.
+"""
+def credential_key():
+    credential = request.headers.get('Authorization')
+    if not credential:
+        return get_remote_address()
+    return 'credential:' + hashlib.sha256(credential.encode()).hexdigest()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unknown'
+    metrics.REQUEST_LATENCY.labels(endpoint, str(response.status_code)).observe(elapsed)
+    # Streamed responses have no length up front
+    if response.content_length:
+        metrics.RESPONSE_BYTES.labels(endpoint).inc(response.content_length)
+    app.logger.debug(f"trace {request.method} {request.path}: {response.status_code} in {elapsed * 1000:.1f} ms")
+    return response
+
+@app.after_request
+def record_usage(response):
+    # Only successful requests made with API tokens are accounted; the admin token is not
+    token_id = g.get('token_id')
+    if token_id is None or response.status_code >= 400:
+        return response
+    if response.content_length is not None:
+        usage_recorder.record(token_id, requests=1, bytes_served=response.content_length)
+    else:
+        usage_recorder.record(token_id, requests=1)
+        response.response = count_streamed_bytes(response.response, token_id)
+    return response
+
+def count_streamed_bytes(body, token_id):
+    """Pass a streamed body through, recording the bytes actually sent once it ends or the client leaves."""
+    sent = 0
+    try:
+        for chunk in body:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        usage_recorder.record(token_id, bytes_served=sent)
+        if hasattr(body, 'close'):
+            body.close()
+
+@app.after_request
+def add_rate_limit_headers(response):
+    result = g.get('token_rate_limit')
+    if result is not None:
+        response.headers.extend(token_rate_limiter.headers(result))
+    return response
 
 
-react_build_directory = os.path.abspath("/app/web")
 
+"""
+Serve the admin UI from ADMIN_BUILD_DIR.
+
+Files are indexed at startup; see StaticAssets. Hashed files under static/
+are cached as immutable, other files revalidate with their ETag. Any other
+path under /admin gets index.html so client-side routes work on reload.
+"""
 @app.route('/admin/static/<path:path>')
 def serve_admin_static(path):
-    return send_from_directory(os.path.join(react_build_directory, 'static'), path)
+    return admin_assets.response(f"static/{path}") or (jsonify({'error': 'Not found'}), 404)
 
 @app.route('/admin/<filename>')
 def serve_admin_root_files(filename):
-    if filename in ['manifest.json', 'favicon.ico', 'logo192.png', 'logo512.png']:
-        return send_from_directory(react_build_directory, filename)
+    if filename != 'index.html' and filename in admin_assets:
+        return admin_assets.response(filename)
     # Forward to the catch-all route for other paths
     return serve_admin(filename)
 
 @app.route('/admin', defaults={'path': ''})
 @app.route('/admin/<path:path>')
 def serve_admin(path):
-    return send_from_directory(react_build_directory, 'index.html')
+    return admin_assets.response('index.html') or (jsonify({'error': 'Not found'}), 404)
 
 
 """
@@ -154,10 +296,83 @@ def add_token():
         current_app.logger.error(f"Error adding token: {e}")
         return jsonify({'error': 'Internal Server Error'}), 500
 
+    # The new token may have been cached as invalid before it existed
+    token_cache.invalidate(token_id=token_id, hashed_token=salted_hashed_token)
+
     # Return the original, unsalted, unhashed token
     return jsonify({'token': new_token_str}), 201
 
 
+"""
+Provision many tokens in one transaction. Admin token only.
+
+Payload:
+    {"tokens": [{"id": "tenant-1", "rate_limit": 20}, {"id": "tenant-2"}]}
+    rate_limit is optional and defaults to DEFAULT_RATE_LIMIT. At most
+    TOKEN_BULK_MAX tokens per request.
+
+Returns:
+    - 201 with {"tokens": {"tenant-1": "<token>", ...}}, the unhashed tokens by ID.
+    - 400 if the payload or an ID is invalid, or an ID appears twice.
+    - 409 with {"existing": [...]} if any ID is taken; nothing is created.
+    - 403 for API tokens.
+"""
+@app.route('/add-tokens', methods=['POST'])
+@limiter.limit("10 per minute", key_func=credential_key)
+@require_token
+def add_tokens():
+    if g.token_id is not None:
+        return jsonify({'error': 'Admin token required'}), 403
+
+    items = (request.get_json(silent=True) or {}).get('tokens')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'tokens must be a non-empty list'}), 400
+    if len(items) > current_app.config['TOKEN_BULK_MAX']:
+        return jsonify({'error': f"At most {current_app.config['TOKEN_BULK_MAX']} tokens per request"}), 400
+
+    default_rate_limit = int(current_app.config.get('DEFAULT_RATE_LIMIT', 10))
+    requested = {}
+    for item in items:
+        token_id = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(token_id, str) or not re.match("^[a-zA-Z0-9_-]+$", token_id):
+            return jsonify({'error': 'Invalid ID format', 'id': token_id}), 400
+        if token_id in requested:
+            return jsonify({'error': 'Duplicate ID', 'id': token_id}), 400
+        rate_limit = item.get('rate_limit')
+        requested[token_id] = rate_limit if isinstance(rate_limit, int) else default_rate_limit
+
+    # Chunked so the IN list stays under the database's bound-parameter limit
+    ids = list(requested)
+    existing = []
+    for start in range(0, len(ids), 500):
+        existing += db.session.scalars(
+            db.select(APIToken.id).where(APIToken.id.in_(ids[start:start + 500]))
+        ).all()
+    if existing:
+        return jsonify({'message': 'Token IDs already exist', 'existing': sorted(existing)}), 409
+
+    characters = string.ascii_letters + string.digits
+    admin_token = current_app.config.get('ADMIN_TOKEN', '')
+    tokens, rows = {}, []
+    for token_id, rate_limit in requested.items():
+        tokens[token_id] = ''.join(secrets.choice(characters) for _ in range(32))
+        rows.append({'id': token_id, 'token': APIToken.hash_token(tokens[token_id], admin_token),
+                     'rate_limit': rate_limit})
+
+    try:
+        db.session.execute(insert(APIToken), rows)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error adding tokens: {e}")
+        return jsonify({'error': 'Internal Server Error'}), 500
+
+    # Freshly generated tokens can't be in any worker's cache, so unlike
+    # /add-token there is nothing to invalidate
+    current_app.logger.info(f"Provisioned {len(rows)} tokens")
+    return jsonify({'tokens': tokens}), 201
+
+
 """
 Edit a token's rate limit.
 
@@ -203,6 +418,7 @@ def edit_token():
         # Update the rate limit
         token.rate_limit = rate_limit
         db.session.commit()
+        token_cache.invalidate(token_id=token_id, hashed_token=token.token)
         app.logger.info(f"Token updated successfully for ID: {token_id}")
         return jsonify({'message': 'Token updated successfully'}), 200
     except Exception as e:
@@ -232,13 +448,16 @@ def revoke_token():
             app.logger.info('Revoke token request with missing token field')
             return jsonify({'error': 'Token is required'}), 400
 
-        token = APIToken.query.filter((APIToken.id == token_str) | (APIToken.token == token_str)).first()
+        # Two indexed lookups rather than an OR, which defeats both indexes
+        token = db.session.get(APIToken, token_str) or APIToken.query.filter_by(token=token_str).first()
         if not token:
             app.logger.info(f'Token or ID not found for revocation: {token_str}')
             return jsonify({'error': 'Token or ID not found'}), 404
 
+        revoked_id, revoked_hash = token.id, token.token
         db.session.delete(token)
         db.session.commit()
+        token_cache.invalidate(token_id=revoked_id, hashed_token=revoked_hash)
         app.logger.info(f'Token revoked successfully: {token_str}')
         return jsonify({'message': 'Token revoked successfully'}), 200
     except Exception as e:
@@ -265,71 +484,547 @@ Or
 "language": "en",
 "translations": ["zh-TW", "de"]}  
 
+Segments are returned in request order. Add "stream": true to the payload (or
+?stream=1 to the URL) to receive each segment as soon as it is ready instead of
+waiting for the whole response.
+
+If some segments fail, the audio of the others is returned with their
+languages listed in the X-Failed-Segments header; if all fail the response is
+a 502 with the error of each segment. Streamed responses skip failed segments.
+
+The response is MP3 unless another format is requested with "format" in the
+payload ("mp3", "opus" or "aac"; also ?format= on the GET form) or negotiated
+through the Accept header (audio/mpeg, audio/ogg, audio/aac). Opus is sent as
+audio/ogg and AAC as ADTS audio/aac, both much smaller for speech; they
+require ffmpeg on the server, otherwise Accept falls back to MP3 and an
+explicit "format" is a 400.
+
+Complete responses carry a weak ETag and the SPEECH_CACHE_CONTROL header;
+a matching If-None-Match is answered with 304 before any synthesis. The GET
+form takes the same payloads as query parameters so CDNs can cache it:
+ /generate-speech?text=horse&language=en&translations=zh-TW,de
+ /generate-speech?localization=zh-tw:馬&localization=en:horse
+
 Example Curl:
  curl -X POST http://localhost:5000/generate-speech -H "Authorization: 1qjEkUygv1QfALZnTk8LLUhHWM2rJfHr" -H "Content-Type: application/json" -d '{"text": "the quick brown fox jumped over the lazy dog","language": "en","translations": ["zh-TW"]}' -o response.mp3
 """
-@app.route('/generate-speech', methods=['POST'])
+@app.route('/generate-speech', methods=['GET', 'POST'])
+@limiter.exempt
 @require_token
-@limiter.limit("10 per minute")
 def generate_speech():
-    data = request.json
+    data = request.json if request.method == 'POST' else speech_payload_from_args(request.args)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Payload must be a JSON object"}), 400
 
     try:
-        combined_mp3 = io.BytesIO()
-        tasks = []
-
-        with ThreadPoolExecutor() as executor:
-            if 'localization' in data:
-                for lang_code, text in data['localization'].items():
-                    if lang_code in lang.tts_langs():
-                        tasks.append(executor.submit(generate_tts, lang_code, text))
-
-            elif 'text' in data and 'language' in data and 'translations' in data:
-                original_text = data['text']
-                original_lang = data['language']
-
-                if original_lang not in lang.tts_langs():
-                    app.logger.info(f"Invalid primary language: {original_lang}")
-                    return jsonify({"error": "Primary language is invalid"}), 400
-
-                # Queue TTS task for original language
-                tasks.append(executor.submit(generate_tts, original_lang, original_text))
-
-                # Queue translation and subsequent TTS tasks
-                for lang_code in data['translations']:
-                    if lang_code in lang.tts_langs():
-                        tasks.append(executor.submit(translate_and_tts, original_text, original_lang, lang_code))
-
-            # Process completed tasks
-            for future in as_completed(tasks):
-                try:
-                    tts_audio_bytes = future.result()
-                    combined_mp3.write(tts_audio_bytes)
-                except Exception as e:
-                    app.logger.error(f"Error in task: {traceback.format_exc()}")
-
-        combined_mp3.seek(0)
-        return send_file(combined_mp3, mimetype='audio/mpeg')
+        segments = plan_segments(data)
+        audio_format = negotiate_audio_format(data)
+    except ValueError as e:
+        app.logger.info(str(e))
+        return jsonify({"error": str(e)}), 400
+    mimetype = AUDIO_FORMATS[audio_format]['mimetype']
+
+    # Identical requests produce identical audio, so revalidation needs no synthesis
+    etag = speech_etag(segments, audio_format)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = current_app.config['SPEECH_CACHE_CONTROL']
+        response.vary.add('Accept')
+        return response
+
+    # Raises SchedulerBusy (503) before any work is queued if the pool is saturated
+    tasks = speech_scheduler.submit_group(
+        partial(synthesize_segment, token_id=g.token_id, audio_format=audio_format), segments
+    )
+
+    if data.get('stream') or request.args.get('stream') in ('1', 'true'):
+        return Response(stream_segments(tasks, audio_format), mimetype=mimetype,
+                        headers={'Cache-Control': 'no-store', 'Vary': 'Accept'})
+
+    try:
+        parts = []
+        failed = []
+
+        # Join segments in request order so the output is deterministic
+        for segment, future in zip(segments, tasks):
+            try:
+                parts.append(future.result())
+            except Exception as e:
+                failed.append({'language': segment.language, 'error': str(e)})
+                app.logger.error(f"Error in task: {e}")
+
+        if failed and len(failed) == len(segments):
+            return jsonify({"error": "Text-to-Speech conversion failed", "segments": failed}), 502
+
+        response = send_file(io.BytesIO(join_audio(parts, audio_format)), mimetype=mimetype)
+        response.vary.add('Accept')
+        if failed:
+            # Never let caches keep a response with missing segments
+            response.headers['Cache-Control'] = 'no-store'
+            response.headers['X-Failed-Segments'] = ','.join(entry['language'] for entry in failed)
+        else:
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = current_app.config['SPEECH_CACHE_CONTROL']
+        return response
 
     except Exception as e:
         app.logger.error(f"Error in generate-speech: {e}")
         return jsonify({"error": "Text-to-Speech conversion failed", "details": str(e)}), 500
 
-def generate_tts(language, text):
+def speech_payload_from_args(args):
+    """Build a /generate-speech payload from the query string of the GET form."""
+    if 'localization' in args:
+        localization = {}
+        for pair in args.getlist('localization'):
+            lang_code, _, text = pair.partition(':')
+            localization[lang_code] = text
+        return {'localization': localization}
+
+    payload = {key: args[key] for key in ('text', 'language') if key in args}
+    if 'translations' in args:
+        payload['translations'] = [code for value in args.getlist('translations') for code in value.split(',') if code]
+    return payload
+
+def negotiate_audio_format(data):
+    """The response format: the payload's "format" if given, else the best match for Accept. Raises ValueError."""
+    formats = transcoder.formats()
+    requested = data.get('format') or request.args.get('format')
+    if requested:
+        audio_format = FORMAT_ALIASES.get(str(requested).lower(), str(requested).lower())
+        if audio_format not in formats:
+            raise ValueError(f"Unsupported format {requested}, expected one of {', '.join(formats)}")
+        return audio_format
+
+    # MP3 is listed first so */* and missing Accept headers keep getting it
+    mimetypes = {mimetype: audio_format for audio_format in formats for mimetype in ACCEPT_TYPES[audio_format]}
+    return mimetypes[request.accept_mimetypes.best_match(list(mimetypes), default='audio/mpeg')]
+
+def speech_etag(segments, audio_format='mp3'):
+    """
+    ETag over the normalized segments, the engines that may synthesize them
+    and the response format with its encoder settings.
+
+    It is weak: the check happens before synthesis, so it can't name the engine
+    that will produce each segment, and a fallback engine or a stored segment
+    from another engine yields equivalent speech in different bytes.
+    """
+    digest = hashlib.sha256(tts_router.fingerprint().encode())
+    for segment in segments:
+        digest.update(json.dumps(normalize_segment(segment), ensure_ascii=False).encode('utf-8'))
+    if audio_format != 'mp3':
+        digest.update(transcoder.fingerprint(audio_format).encode())
+    return digest.hexdigest()
+
+"""
+A single unit of speech output, spoken in the TTS code `language`. When
+`source_language` is set, `text` is first translated from it into
+`target_language`; both are translation codes, which can be spelled
+differently from the TTS code (e.g. "he" is "iw" for TTS).
+"""
+Segment = namedtuple('Segment', ['language', 'text', 'source_language', 'target_language'], defaults=[None, None])
+
+def require_code(code):
+    """Return `code` if it is a string; language codes of any other type are rejected with ValueError."""
+    if not isinstance(code, str):
+        raise ValueError(f"Language codes must be strings, got {json.dumps(code)}")
+    return code
+
+def plan_segments(data):
+    """Turn a /generate-speech payload into Segments in request order. Raises ValueError on an invalid payload."""
+    segments = []
+    if 'localization' in data:
+        if not isinstance(data['localization'], dict):
+            raise ValueError("localization must map language codes to text")
+        for lang_code, text in data['localization'].items():
+            if not isinstance(text, str):
+                raise ValueError(f"Text for {lang_code} must be a string")
+            # Codes are matched case-insensitively and replaced by their canonical spelling
+            lang_code = language_registry.tts(lang_code)
+            if lang_code:
+                segments.append(Segment(lang_code, text))
+
+    elif 'text' in data and 'language' in data and 'translations' in data:
+        original_text = data['text']
+        if not isinstance(data['text'], str):
+            raise ValueError("text must be a string")
+        if not isinstance(data['translations'], list):
+            raise ValueError("translations must be a list of language codes")
+        original_lang = language_registry.tts(require_code(data['language']))
+
+        if not original_lang:
+            raise ValueError("Primary language is invalid")
+
+        segments.append(Segment(original_lang, original_text))
+        translations = [
+            (language_registry.tts(lang_code), language_registry.translation(lang_code))
+            for lang_code in map(require_code, data['translations'])
+        ]
+        translations = [(tts_code, target) for tts_code, target in translations if tts_code and target]
+        source = language_registry.translation(data['language'])
+        if translations and not source:
+            raise ValueError("Primary language cannot be translated")
+        for tts_code, target in translations:
+            segments.append(Segment(tts_code, original_text, source, target))
+
+    return segments
+
+# Whether the segment being synthesized on this thread was served from a cache
+_usage = threading.local()
+
+def synthesize_segment(segment, token_id=None, audio_format='mp3'):
+    """Return a Segment's audio in `audio_format`, recording its usage against `token_id` if given."""
+    _usage.cache_hit = None
+    if segment.source_language:
+        audio_bytes = translate_and_tts(segment.text, segment.source_language, segment.target_language,
+                                        segment.language)
+    else:
+        audio_bytes = generate_tts(segment.language, segment.text)
+    if audio_format != 'mp3':
+        audio_bytes = transcode_segment(audio_bytes, audio_format)
+    if token_id is not None:
+        usage_recorder.record(token_id, segments=1, characters=len(segment.text),
+                              cache_hits=1 if _usage.cache_hit else 0)
+    return audio_bytes
+
+def note_cache_result(hit):
+    # Only the outermost lookup for a segment counts, not the lookups of its chunks
+    if getattr(_usage, 'cache_hit', False) is None:
+        _usage.cache_hit = hit
+
+def transcode_segment(mp3, audio_format):
+    """Re-encode a segment's MP3, cached per (segment audio, format) so repeats skip ffmpeg."""
+    key = ('transcode', audio_format, hashlib.sha256(mp3).hexdigest())
+    cached = segment_cache.get(key)
+    metrics.cache_lookup('transcode', cached is not None)
+    if cached is not None:
+        return cached
+    return inflight.do(key, _transcode, mp3, audio_format, key)
+
+def _transcode(mp3, audio_format, key):
+    # Each segment gets its own Ogg serial so chained segments stay distinct streams
+    with metrics.timed(metrics.TRANSCODE_LATENCY, trace=f'transcode {audio_format}', format=audio_format):
+        audio_bytes = transcoder.transcode(strip_mp3(mp3), audio_format, serial=int(key[2][:7], 16))
+    segment_cache.set(key, audio_bytes)
+    return audio_bytes
+
+def stream_segments(tasks, audio_format='mp3'):
+    """
+    Yield each segment's audio in request order as soon as it is ready.
+
+    The segments were all queued up front, so later ones keep synthesizing
+    while earlier ones are being sent. Failed segments are logged and skipped.
+    """
     try:
-        tts = gTTS(text=text, lang=language)
-        audio_fp = io.BytesIO()
-        tts.write_to_fp(audio_fp)
-        return audio_fp.getvalue()
-    except Exception as e:
-        raise Exception(f"Failed to generate speech for {language}: {e}")
+        for index, future in enumerate(tasks):
+            try:
+                audio_bytes = future.result()
+            except Exception:
+                app.logger.error(f"Error in task: {traceback.format_exc()}")
+                continue
+            # Release the finished segment before the next one is awaited
+            tasks[index] = None
+            yield strip_mp3(audio_bytes) if audio_format == 'mp3' else audio_bytes
+    finally:
+        # Client disconnects close the generator; don't keep synthesizing for nobody
+        for future in tasks:
+            if future is not None:
+                future.cancel()
+
+"""
+Generates speech for many items in one request.
+
+Each item uses either /generate-speech payload shape. Identical segments and
+translations across the batch are synthesized once, on one fair-share group
+of the speech scheduler.
+
+Returns:
+    By default a zip archive with one <index>.mp3 per successful item and a
+    manifest.json describing every item, including per-segment errors.
+    With "Accept: multipart/mixed", a multipart stream with one part per item,
+    sent in item order as each item completes; failed items are JSON parts.
+    400 if the payload is not a list of items or has too many items or segments.
+
+Valid payload:
+{"items": [
+    {"localization": {"zh-tw": "馬", "en": "horse"}},
+    {"text": "dog", "language": "en", "translations": ["zh-TW", "de"]}]}
+"""
+@app.route('/generate-speech-batch', methods=['POST'])
+@limiter.exempt
+@require_token
+def generate_speech_batch():
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({"error": "Payload must be a JSON object"}), 400
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    max_items = current_app.config['SPEECH_BATCH_MAX_ITEMS']
+    if len(items) > max_items:
+        return jsonify({"error": f"A batch may contain at most {max_items} items"}), 400
+
+    # Each item is planned and normalized on its own, so a malformed item fails
+    # only its manifest entry
+    planned = []
+    for item in items:
+        try:
+            segments = plan_segments(item)
+            planned.append((segments, [normalize_segment(segment) for segment in segments], None))
+        except (ValueError, AttributeError, TypeError) as e:
+            planned.append(([], [], str(e) or 'Invalid item'))
+
+    # One task per distinct segment across the whole batch. The normalized form
+    # is only the dedup key; the first occurrence, with its canonical codes, is synthesized
+    unique_segments = {}
+    for segments, keys, _ in planned:
+        for key, segment in zip(keys, segments):
+            unique_segments.setdefault(key, segment)
+    if len(unique_segments) > speech_scheduler.max_queue:
+        return jsonify({"error": f"A batch may contain at most {speech_scheduler.max_queue} distinct segments"}), 400
+    futures = dict(zip(unique_segments, speech_scheduler.submit_group(
+        partial(synthesize_segment, token_id=g.token_id), list(unique_segments.values())
+    )))
+    app.logger.info(f"Batch of {len(items)} items resolved to {len(unique_segments)} distinct segments")
+
+    results = (
+        collect_batch_item(segments, keys, error, futures) for segments, keys, error in planned
+    )
+    if request.accept_mimetypes.best_match(['application/zip', 'multipart/mixed']) == 'multipart/mixed':
+        boundary = secrets.token_hex(16)
+        return Response(stream_batch_multipart(results, boundary),
+                        mimetype=f'multipart/mixed; boundary={boundary}')
+
+    archive = io.BytesIO()
+    manifest = []
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as zf:
+        for index, (audio_bytes, entry) in enumerate(results):
+            if audio_bytes:
+                entry['file'] = f"{index}.mp3"
+                zf.writestr(entry['file'], audio_bytes)
+            manifest.append(entry)
+        zf.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+    archive.seek(0)
+    return send_file(archive, mimetype='application/zip', as_attachment=True, download_name='speech.zip')
+
+def normalize_segment(segment):
+    """Normalize a Segment so equivalent segments from different items deduplicate."""
+    return Segment(segment.language.lower(), normalize_text(segment.text),
+                   segment.source_language.lower() if segment.source_language else None,
+                   segment.target_language.lower() if segment.target_language else None)
+
+def collect_batch_item(segments, keys, error, futures):
+    """Wait for one item's segments, found in `futures` by their normalized `keys`. Returns (audio bytes, manifest entry)."""
+    if error:
+        return b'', {'status': 'error', 'error': error}
+
+    audio = io.BytesIO()
+    failed = []
+    for segment, key in zip(segments, keys):
+        try:
+            audio.write(strip_mp3(futures[key].result()))
+        except Exception as e:
+            failed.append({'language': segment.language, 'error': str(e)})
+
+    if not segments:
+        status = 'error'
+        failed.append({'error': 'No supported languages in item'})
+    elif len(failed) == len(segments):
+        status = 'error'
+    elif failed:
+        status = 'partial'
+    else:
+        status = 'ok'
+    return audio.getvalue(), {'status': status, 'segments': len(segments), 'errors': failed}
+
+def stream_batch_multipart(results, boundary):
+    for index, (audio_bytes, entry) in enumerate(results):
+        if audio_bytes:
+            headers = f"Content-Type: audio/mpeg\r\nX-Item-Index: {index}\r\nX-Item-Status: {entry['status']}\r\n"
+            if entry['errors']:
+                headers += f"X-Item-Errors: {json.dumps(entry['errors'])}\r\n"
+            body = audio_bytes
+        else:
+            headers = f"Content-Type: application/json\r\nX-Item-Index: {index}\r\nX-Item-Status: error\r\n"
+            body = json.dumps(entry).encode()
+        yield f"--{boundary}\r\n{headers}\r\n".encode() + body + b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+job_runner = JobRunner(
+    app, speech_scheduler, plan_segments, synthesize_segment,
+    workers=app.config['JOB_WORKERS'], retention=app.config['JOB_RETENTION'],
+)
+
+# Only serving processes run jobs: importing the app (the CLI, a preloading
+# master) must not claim jobs it would abandon on exit
+@app.before_request
+def start_job_runner():
+    job_runner.start()
 
-def translate_and_tts(original_text, original_lang, target_lang):
+"""
+Submits a speech generation job to run in the background.
+
+Accepts the same payloads as /generate-speech. Use this for large requests
+that would otherwise hold a connection open past proxy timeouts.
+
+Returns:
+    202 with the job id and the URLs for its status and audio.
+    400 if the payload is invalid or has no supported languages.
+"""
+@app.route('/speech-jobs', methods=['POST'])
+@limiter.exempt
+@require_token
+def submit_speech_job():
+    data = request.json or {}
     try:
-        translator = Translator()
-        translation = translator.translate(original_text, src=original_lang, dest=target_lang).text
-        app.logger.info(f"Translation to {target_lang}: {translation}")
-        return generate_tts(target_lang, translation)
+        job_id = job_runner.submit(data, token_id=g.token_id)
+    except (ValueError, AttributeError, TypeError) as e:
+        app.logger.info(f"Invalid speech job: {e}")
+        return jsonify({"error": str(e) or "Invalid payload"}), 400
+
+    return jsonify({
+        'job_id': job_id,
+        'status_url': f'/speech-jobs/{job_id}',
+        'audio_url': f'/speech-jobs/{job_id}/audio',
+    }), 202
+
+"""
+Returns a speech job's status and per-segment progress.
+
+Returns:
+    200 with status (queued, running, done or failed), segment counts and a
+    per-segment list of {language, status, error}.
+    404 if the job does not exist or belongs to another token.
+"""
+@app.route('/speech-jobs/<job_id>', methods=['GET'])
+@limiter.exempt
+@require_token
+def get_speech_job(job_id):
+    job = find_speech_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'total': job.total,
+        'completed': job.completed,
+        'failed': job.failed,
+        'segments': json.loads(job.segments),
+        'error': job.error,
+        'date_created': job.date_created.strftime('%Y-%m-%d %H:%M:%S'),
+    }), 200
+
+"""
+Downloads the MP3 produced by a finished speech job.
+
+Returns:
+    200 with the audio once the job is done.
+    409 if the job has not finished, or failed.
+    404 if the job does not exist or belongs to another token.
+"""
+@app.route('/speech-jobs/<job_id>/audio', methods=['GET'])
+@limiter.exempt
+@require_token
+def get_speech_job_audio(job_id):
+    job = find_speech_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status != 'done':
+        return jsonify({'error': f'Job is {job.status}', 'status': job.status}), 409
+
+    return send_file(io.BytesIO(job.result), mimetype='audio/mpeg', download_name=f'{job.id}.mp3')
+
+def find_speech_job(job_id):
+    job = db.session.get(SpeechJob, job_id)
+    # Jobs are only visible to the token that submitted them (and the admin)
+    if job is None or (g.token_id is not None and job.token_id != g.token_id):
+        return None
+    return job
+
+def generate_tts(language, text):
+    return _generate_tts(language, text)[0]
+
+def _generate_tts(language, text):
+    """Return (MP3 bytes, name of the engine that produced them or None if unknown)."""
+    key = segment_key(language, text)
+    cached = segment_cache.get(key)
+    metrics.cache_lookup('segment', cached is not None)
+    if cached is not None:
+        note_cache_result(True)
+        return cached, None
+
+    # Stored audio from any engine that speaks the language is good enough, even
+    # while that engine is unavailable (e.g. its circuit breaker is open)
+    for engine in tts_router.supporting(language):
+        stored = audio_store.get(audio_store.digest(engine.name, language, text))
+        metrics.cache_lookup('audio_store', stored is not None)
+        if stored is not None:
+            note_cache_result(True)
+            segment_cache.set(key, stored)
+            return stored, engine.name
+    note_cache_result(False)
+
+    engines = tts_router.candidates(language)
+    if not engines:
+        raise Exception(f"No TTS engine available for {language}")
+
+    # Long passages are synthesized chunk by chunk in parallel; each chunk is cached on its own
+    chunks = engines[0].split_text(language, text)
+    if len(chunks) > 1:
+        results = speech_scheduler.map(lambda chunk: _generate_tts(language, chunk), chunks)
+        audio_bytes = join_audio([chunk_audio for chunk_audio, _ in results], 'mp3')
+        segment_cache.set(key, audio_bytes)
+        # The store is keyed by engine, so audio mixed from several (or unknown) engines stays out of it
+        producers = {engine_name for _, engine_name in results}
+        engine_name = producers.pop() if len(producers) == 1 else None
+        if engine_name is not None:
+            audio_store.put(audio_store.digest(engine_name, language, text), audio_bytes)
+        return audio_bytes, engine_name
+
+    # Identical segments requested concurrently share one synthesis
+    return inflight.do(('tts',) + key, _synthesize, engines, language, text, key)
+
+def _synthesize(engines, language, text, key):
+    # Fall through to the next engine if the preferred one fails
+    errors = []
+    for engine in engines:
+        started = time.perf_counter()
+        try:
+            with engine.slots, metrics.timed(metrics.TTS_LATENCY, trace=f'tts {engine.name} {language}',
+                                             engine=engine.name, language=key[0]):
+                audio_bytes = engine.synthesize(language, text)
+        except Exception as e:
+            errors.append(f"{engine.name}: {e}")
+            continue
+        tts_router.record(engine, time.perf_counter() - started)
+
+        segment_cache.set(key, audio_bytes)
+        audio_store.put(audio_store.digest(engine.name, language, text), audio_bytes)
+        return audio_bytes, engine.name
+    raise Exception(f"Failed to generate speech for {language}: {'; '.join(errors)}")
+
+def translate_text(original_text, original_lang, target_lang):
+    cached = translation_cache.get(original_lang, target_lang, original_text)
+    metrics.cache_lookup('translation', cached is not None)
+    if cached is not None:
+        return cached
+
+    key = ('translate', original_lang.lower(), target_lang.lower(), normalize_text(original_text))
+    return inflight.do(key, _translate, original_text, original_lang, target_lang)
+
+def _translate(original_text, original_lang, target_lang):
+    # The batcher sends each upstream call through translate_caller under a translate slot
+    with metrics.timed(metrics.TRANSLATE_LATENCY, trace=f'translate {original_lang}>{target_lang}'):
+        translation = translation_batcher.translate(original_text, original_lang, target_lang)
+    app.logger.info(f"Translation to {target_lang}: {translation}")
+    translation_cache.set(original_lang, target_lang, original_text, translation)
+    return translation
+
+def translate_and_tts(original_text, original_lang, target_lang, tts_lang):
+    try:
+        translation = translate_text(original_text, original_lang, target_lang)
+        return generate_tts(tts_lang, translation)
     except Exception as e:
         raise Exception(f"Failed in translation or TTS for {target_lang}: {e}")
 
@@ -337,33 +1032,121 @@ def translate_and_tts(original_text, original_lang, target_lang):
 
 
 """
-Retrieves a list of all tokens.
+Retrieves a list of tokens, ordered by ID.
+
+Query parameters (all optional):
+    - prefix: only IDs starting with this.
+    - rate_limit: only tokens with this rate limit.
+    - created_after / created_before: ISO 8601 UTC bounds on date_created.
+    - limit: page size (capped at LIST_TOKENS_MAX_PAGE). When more tokens
+      follow, the X-Next-Cursor header holds the value to pass as `after`.
+    - after: return tokens whose ID sorts after this cursor.
+    Without limit every matching token is streamed.
 
 Returns:
     - A JSON response with the list of tokens and their corresponding IDs.
         Example: [{"id": 1, "token": "abc123"}, {"id": 2, "token": "xyz456"}]
+    - 400 if a parameter is malformed.
     - If an error occurs, a JSON response with an error message and details.
         Example: {"error": "Failed to retrieve tokens", "details": "Database connection error"}
 """
 @app.route('/list-tokens', methods=['GET'])
+@limiter.limit("10 per minute", key_func=credential_key)
 @require_token
-@limiter.limit("10 per minute")
 def list_tokens():
+    query = APIToken.query
     try:
-        tokens = APIToken.query.all()
-        token_list = [
-            {
-                'id': token.id,
-                'token': token.token,  # This is the hashed token
-                'rate_limit': token.rate_limit,
-                'date_created': token.date_created.strftime('%Y-%m-%d %H:%M') if token.date_created else None
-            } for token in tokens
-        ]
-        return jsonify(token_list), 200
+        if request.args.get('prefix'):
+            query = query.filter(APIToken.id.startswith(request.args['prefix'], autoescape=True))
+        if request.args.get('rate_limit'):
+            query = query.filter(APIToken.rate_limit == int(request.args['rate_limit']))
+        if request.args.get('created_after'):
+            query = query.filter(APIToken.date_created >= datetime.datetime.fromisoformat(request.args['created_after']))
+        if request.args.get('created_before'):
+            query = query.filter(APIToken.date_created < datetime.datetime.fromisoformat(request.args['created_before']))
+        if request.args.get('after'):
+            query = query.filter(APIToken.id > request.args['after'])
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+    except ValueError as e:
+        return jsonify({'error': 'Invalid query parameter', 'details': str(e)}), 400
+    query = query.order_by(APIToken.id)
+
+    try:
+        if limit is not None:
+            limit = max(1, min(limit, current_app.config['LIST_TOKENS_MAX_PAGE']))
+            # One extra row tells us whether there is a next page
+            tokens = query.limit(limit + 1).all()
+            response = jsonify([token_summary(token) for token in tokens[:limit]])
+            if len(tokens) > limit:
+                response.headers['X-Next-Cursor'] = tokens[limit - 1].id
+            return response, 200
+
+        def generate():
+            yield '['
+            for i, token in enumerate(query.yield_per(1000)):
+                yield (',' if i else '') + json.dumps(token_summary(token))
+            yield ']'
+        return Response(stream_with_context(generate()), mimetype='application/json'), 200
     except Exception as e:
         app.logger.error(f"Error in list-tokens: {e}")
         return jsonify({"error": "Failed to retrieve tokens", "details": str(e)}), 500
 
 
+def token_summary(token):
+    return {
+        'id': token.id,
+        'token': token.token,  # This is the hashed token
+        'rate_limit': token.rate_limit,
+        'date_created': token.date_created.strftime('%Y-%m-%d %H:%M') if token.date_created else None
+    }
+
+
+"""
+Reports usage per token.
+
+Query parameters:
+    - token_id: return this token's usage per time bucket instead of totals per token.
+    - since: only count buckets starting at or after this ISO 8601 UTC time.
+
+Returns:
+    - Without token_id, totals per token:
+        [{"token_id": "app1", "requests": 12, "segments": 30, "characters": 410, "cache_hits": 8, "bytes_served": 91234}]
+    - With token_id, {"token_id": "app1", "buckets": [{"bucket": "2024-01-01T10:00:00", "requests": 12, ...}]}
+    API tokens only see their own usage. This worker's pending counters are
+    flushed first; other workers' counters appear after their next flush.
+"""
+@app.route('/token-usage', methods=['GET'])
+@limiter.limit("60 per minute", key_func=credential_key)
+@require_token
+def token_usage():
+    token_id = request.args.get('token_id')
+    if g.token_id is not None:
+        token_id = g.token_id
+
+    query = TokenUsage.query
+    if request.args.get('since'):
+        try:
+            since = datetime.datetime.fromisoformat(request.args['since'])
+        except ValueError:
+            return jsonify({'error': 'Invalid since, expected an ISO 8601 time'}), 400
+        query = query.filter(TokenUsage.bucket >= since)
+
+    try:
+        usage_recorder.flush()
+        if token_id:
+            rows = query.filter_by(token_id=token_id).order_by(TokenUsage.bucket).all()
+            buckets = [dict({name: getattr(row, name) for name in USAGE_COUNTERS}, bucket=row.bucket.isoformat())
+                       for row in rows]
+            return jsonify({'token_id': token_id, 'buckets': buckets}), 200
+
+        totals = query.with_entities(
+            TokenUsage.token_id, *[db.func.sum(getattr(TokenUsage, name)) for name in USAGE_COUNTERS]
+        ).group_by(TokenUsage.token_id).all()
+        return jsonify([dict(zip(USAGE_COUNTERS, map(int, row[1:])), token_id=row[0]) for row in totals]), 200
+    except Exception as e:
+        app.logger.error(f"Error in token-usage: {e}")
+        return jsonify({"error": "Failed to retrieve usage", "details": str(e)}), 500
+
+
 
 
@@ -0,0 +1,135 @@
+# langserver/scheduler.py
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from . import metrics
+from .threads import BackgroundThreads
+
+
+class SchedulerBusy(Exception):
+    """Raised when the scheduler's queue cannot admit a request's tasks."""
+
+    def __init__(self, retry_after):
+        super().__init__('Speech scheduler queue is full')
+        self.retry_after = retry_after
+
+
+class _Task:
+    __slots__ = ('fn', 'args', 'future', 'enqueued_at')
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class SpeechScheduler:
+    """
+    Application-wide worker pool shared by every speech request.
+
+    Tasks are submitted in groups (normally one group per request) and workers
+    take tasks from the groups round-robin, so a request with many segments
+    cannot starve the requests queued behind it. At most `max_queue` tasks may
+    wait at once; beyond that submit_group() raises SchedulerBusy instead of
+    queueing more work.
+
+    `translate_slots` and `tts_slots` cap how many workers may be inside an
+    upstream translation or TTS call at the same time.
+    """
+
+    def __init__(self, workers, max_queue, translate_concurrency, tts_concurrency, retry_after=5):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.translate_slots = threading.BoundedSemaphore(translate_concurrency)
+        self.tts_slots = threading.BoundedSemaphore(tts_concurrency)
+        self._groups = OrderedDict()
+        self._group_ids = itertools.count()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._threads = BackgroundThreads(self._work, 'speech-worker', count=workers)
+
+    def submit_group(self, fn, items):
+        """Queue fn(item) for every item as one fair-share group. Returns futures in item order."""
+        return self._enqueue(deque(_Task(fn, (item,)) for item in items))
+
+    def submit(self, fn, *args):
+        return self._enqueue(deque([_Task(fn, args)]))[0]
+
+    def map(self, fn, items):
+        """
+        Run fn(item) for every item on the pool and return the results in order.
+
+        Safe to call from a worker: the calling thread runs any of its tasks no
+        other worker has picked up yet, so nested work cannot deadlock the pool.
+        If the queue is full the items simply run inline.
+        """
+        tasks = deque(_Task(fn, (item,)) for item in items)
+        futures = [task.future for task in tasks]
+        try:
+            group_id = self._enqueue(tasks, return_group=True)
+        except SchedulerBusy:
+            return [fn(item) for item in items]
+
+        while True:
+            with self._cond:
+                if not tasks:
+                    break
+                task = tasks.popleft()
+                self._pending -= 1
+                metrics.QUEUE_DEPTH.set(self._pending)
+                if not tasks:
+                    self._groups.pop(group_id, None)
+            self._run(task)
+        return [future.result() for future in futures]
+
+    def stats(self):
+        with self._cond:
+            return {'workers': self.workers, 'pending': self._pending, 'groups': len(self._groups)}
+
+    def _enqueue(self, tasks, return_group=False):
+        # Collect futures first; workers start draining the deque as soon as it is queued
+        futures = [task.future for task in tasks]
+        group_id = next(self._group_ids)
+        if futures:
+            with self._cond:
+                self._threads.start()
+                if self._pending + len(tasks) > self.max_queue:
+                    raise SchedulerBusy(self.retry_after)
+                self._groups[group_id] = tasks
+                self._pending += len(tasks)
+                metrics.QUEUE_DEPTH.set(self._pending)
+                self._cond.notify(len(futures))
+        return group_id if return_group else futures
+
+    def _next_task(self):
+        with self._cond:
+            while not self._groups:
+                self._cond.wait()
+            group_id, tasks = self._groups.popitem(last=False)
+            task = tasks.popleft()
+            if tasks:
+                # Back of the line: every other group gets a turn first
+                self._groups[group_id] = tasks
+            self._pending -= 1
+            metrics.QUEUE_DEPTH.set(self._pending)
+            return task
+
+    def _work(self):
+        while True:
+            self._run(self._next_task())
+
+    @staticmethod
+    def _run(task):
+        if not task.future.set_running_or_notify_cancel():
+            return
+        metrics.QUEUE_WAIT.observe(time.monotonic() - task.enqueued_at)
+        try:
+            result = task.fn(*task.args)
+        except BaseException as e:
+            task.future.set_exception(e)
+        else:
+            task.future.set_result(result)
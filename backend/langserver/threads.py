@@ -0,0 +1,39 @@
+# langserver/threads.py
+import os
+import threading
+
+
+class BackgroundThreads:
+    """
+    Daemon threads running `target`, started lazily once per process.
+
+    Threads don't survive fork, so an object created before a pre-forking
+    server forks has none in its workers. start() is cheap to call on every
+    use: the first call in each process runs `on_start`, which resets any
+    state inherited from the parent, and then starts `count` threads.
+    """
+
+    def __init__(self, target, name, count=1, on_start=None):
+        self.target = target
+        self.name = name
+        self.count = count
+        self.on_start = on_start
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def running(self):
+        """Whether the threads were started in this process."""
+        return self._pid == os.getpid()
+
+    def start(self):
+        if self.running():
+            return
+        with self._lock:
+            if self.running():
+                return
+            self._pid = os.getpid()
+            if self.on_start:
+                self.on_start()
+            for index in range(self.count):
+                name = self.name if self.count == 1 else f'{self.name}-{index}'
+                threading.Thread(target=self.target, name=name, daemon=True).start()
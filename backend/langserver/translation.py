@@ -0,0 +1,143 @@
+# langserver/translation.py
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, wait
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .cache import LRUCache, normalize_text
+from .models import Translation
+from .resilience import CircuitOpen, UpstreamThrottled
+
+
+def translation_key(src, dest, text):
+    """Build the cache key for translating `text` from `src` to `dest`."""
+    material = '\0'.join((src.lower(), dest.lower(), normalize_text(text)))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    """
+    Two-tier translation cache: an in-memory LRU in front of the `Translation` table.
+
+    Database access runs in its own app context because lookups happen on
+    executor threads outside of any request.
+    """
+
+    def __init__(self, app, max_bytes, persist=True):
+        self.app = app
+        self.persist = persist
+        self.memory = LRUCache(max_bytes, sizeof=lambda value: len(value.encode('utf-8')))
+
+    def get(self, src, dest, text):
+        key = translation_key(src, dest, text)
+        cached = self.memory.get(key)
+        if cached is not None or not self.persist:
+            return cached
+
+        try:
+            with self.app.app_context():
+                record = db.session.get(Translation, key)
+                translation = record.translation if record else None
+        except Exception as e:
+            logging.warning(f"Translation cache lookup failed: {e}")
+            return None
+
+        if translation is not None:
+            self.memory.set(key, translation)
+        return translation
+
+    def set(self, src, dest, text, translation):
+        key = translation_key(src, dest, text)
+        self.memory.set(key, translation)
+        if not self.persist:
+            return
+
+        try:
+            with self.app.app_context():
+                try:
+                    db.session.add(Translation(key=key, src=src, dest=dest, text=normalize_text(text), translation=translation))
+                    db.session.commit()
+                except IntegrityError:
+                    # Another worker stored the same translation first
+                    db.session.rollback()
+        except Exception as e:
+            logging.warning(f"Translation cache write failed: {e}")
+
+
+class TranslationBatcher:
+    """
+    Micro-batch concurrent translation requests into batched upstream calls.
+
+    The first caller in an empty window waits `window` seconds for others to
+    join, then sends everything pending (at most `max_batch` items; a caller
+    that fills the batch sends it straight away) through
+    upstream.translate_many(). If the batched call fails, each item is retried
+    on its own so one bad item cannot fail its neighbours.
+
+    Every upstream request holds one of `slots` and, given a `caller`
+    (a ResilientCaller), goes through it, so a batch counts once against the
+    circuit breaker however many items it carries.
+    """
+
+    def __init__(self, upstream, slots, window, max_batch, caller=None):
+        self.upstream = upstream
+        self.slots = slots
+        self.caller = caller
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.batched_items = 0
+        self.fallbacks = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def translate(self, text, src, dest):
+        if self.window <= 0 or self.max_batch <= 1:
+            return self._call(self.upstream.translate, text, src, dest)
+
+        future = Future()
+        batch = None
+        with self._lock:
+            self._pending.append(((text, src, dest), future))
+            leader = len(self._pending) == 1
+            if len(self._pending) >= self.max_batch:
+                batch, self._pending = self._pending, []
+
+        if batch is None and leader:
+            # Wake early if a full batch already carried this item
+            wait([future], timeout=self.window)
+            with self._lock:
+                batch, self._pending = self._pending, []
+        if batch:
+            self._send(batch)
+        return future.result()
+
+    def _send(self, batch):
+        triples = [triple for triple, _ in batch]
+        try:
+            translations = self._call(self.upstream.translate_many, triples)
+            self.batches += 1
+            self.batched_items += len(batch)
+        except (UpstreamThrottled, CircuitOpen) as e:
+            # Retrying item by item would only multiply the rejected requests
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        except Exception as e:
+            logging.warning(f"Batched translation of {len(batch)} items failed, retrying individually: {e}")
+            self.fallbacks += 1
+            translations = None
+
+        for index, (triple, future) in enumerate(batch):
+            if translations is not None:
+                future.set_result(translations[index])
+                continue
+            try:
+                future.set_result(self._call(self.upstream.translate, *triple))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _call(self, fn, *args):
+        with self.slots:
+            return self.caller.call(fn, *args) if self.caller else fn(*args)
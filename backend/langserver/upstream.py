@@ -0,0 +1,170 @@
+# langserver/upstream.py
+import base64
+import json
+import re
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+# _tokenize and _prepare_requests are private gTTS API; requirements.txt pins the version they match
+from gtts import gTTS
+from gtts.tts import gTTSError
+from . import metrics
+from .resilience import UpstreamThrottled
+
+# gTTS wraps each audio chunk in an RPC response line like: jQ1olc","[\"<base64>\"]
+_AUDIO_PATTERN = re.compile(r'jQ1olc","\[\\"(.*)\\"]')
+
+
+class UpstreamClient:
+    """
+    Keep-alive connections to Google's TTS and translate endpoints.
+
+    gTTS opens a new requests.Session for every text chunk and googletrans
+    builds a new httpx client per Translator, so each segment used to pay for
+    a fresh TCP and TLS handshake. Here gTTS only prepares the requests, which
+    are sent over one pooled session, and each worker thread keeps its own
+    HTTP/2 Translator for its lifetime. googletrans (and httpx) are imported
+    on the first translation rather than at startup.
+
+    `timeout` (seconds) bounds every connect and read so a hung connection
+    can't hold a worker thread indefinitely. `tts_url` and `translate_url`
+    replace Google's batchexecute endpoints, e.g. with the stand-in servers
+    in benchmarks/.
+    """
+
+    def __init__(self, pool_size, timeout=None, tts_url=None, translate_url=None):
+        self.timeout = timeout
+        self.tts_url = tts_url
+        self.translate_url = translate_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._local = threading.local()
+
+    def split_text(self, language, text):
+        """Split text into the chunks gTTS would send as separate requests."""
+        return gTTS(text=text, lang=language, lang_check=False)._tokenize(text)
+
+    def synthesize(self, language, text, timeout=None):
+        # Languages are validated before synthesis, so skip gTTS's per-call language lookup
+        tts = gTTS(text=text, lang=language, lang_check=False)
+        audio = bytearray()
+        for prepared in tts._prepare_requests():
+            if self.tts_url:
+                prepared.prepare_url(self.tts_url, None)
+            settings = self.session.merge_environment_settings(prepared.url, {}, None, None, None)
+            try:
+                response = self.session.send(prepared, timeout=timeout or self.timeout, **settings)
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                kind = _error_kind(response.status_code)
+                metrics.UPSTREAM_ERRORS.labels('tts', kind).inc()
+                if kind == 'throttled':
+                    raise UpstreamThrottled(str(gTTSError(tts=tts, response=response)))
+                raise gTTSError(tts=tts, response=response)
+            except requests.exceptions.RequestException as e:
+                metrics.UPSTREAM_ERRORS.labels('tts', 'error').inc()
+                raise gTTSError(f"Failed to connect: {e}")
+
+            for line in response.iter_lines(chunk_size=1024):
+                decoded_line = line.decode('utf-8')
+                if 'jQ1olc' in decoded_line:
+                    match = _AUDIO_PATTERN.search(decoded_line)
+                    if not match:
+                        raise gTTSError(tts=tts, response=response)
+                    audio += base64.b64decode(match.group(1).encode('ascii'))
+        return bytes(audio)
+
+    def translate(self, text, src, dest):
+        if self.translate_url:
+            # googletrans only builds https://<host>/... URLs, so other endpoints take the RPC path
+            return self.translate_many([(text, src, dest)])[0]
+        try:
+            return self.translator().translate(text, src=src, dest=dest).text
+        except Exception:
+            metrics.UPSTREAM_ERRORS.labels('translate', 'error').inc()
+            raise
+
+    def translate_many(self, triples):
+        """
+        Translate several (text, src, dest) triples in one HTTP round trip.
+
+        Google's batchexecute endpoint accepts many RPCs in a single f.req
+        envelope and tags each response with the RPC's index. Returns one
+        translated string per request, in order; raises if any is missing so the
+        caller can fall back to single translate() calls.
+        """
+        if len(triples) == 1 and not self.translate_url:
+            text, src, dest = triples[0]
+            return [self.translate(text, src, dest)]
+
+        from googletrans import urls
+        from googletrans.client import RPC_ID
+
+        translator = self.translator()
+        rpcs = []
+        for index, (text, src, dest) in enumerate(triples, start=1):
+            params = json.dumps([[text, _language_code(src), _language_code(dest), True], [None]], separators=(',', ':'))
+            rpcs.append([RPC_ID, params, None, str(index)])
+        response = translator.client.post(
+            self.translate_url or urls.TRANSLATE_RPC.format(host=translator._pick_service_url()),
+            params={'rpcids': RPC_ID, 'bl': 'boq_translate-webserver_20201207.13_p0',
+                    'soc-app': 1, 'soc-platform': 1, 'soc-device': 1, 'rt': 'c'},
+            data={'f.req': json.dumps([rpcs], separators=(',', ':'))},
+        )
+        if response.status_code != 200:
+            kind = _error_kind(response.status_code)
+            metrics.UPSTREAM_ERRORS.labels('translate', kind).inc()
+            if kind == 'throttled':
+                raise UpstreamThrottled(f'Batched translate throttled with status code "{response.status_code}"')
+            raise Exception(f'Unexpected status code "{response.status_code}" from batched translate')
+
+        results = {}
+        for line in response.text.split('\n'):
+            if not line.startswith('[["wrb.fr"'):
+                continue
+            for envelope in json.loads(line):
+                if envelope[0] == 'wrb.fr' and envelope[1] == RPC_ID and envelope[2]:
+                    results[envelope[6]] = _translated_text(json.loads(envelope[2]))
+
+        missing = [index for index in range(1, len(triples) + 1) if str(index) not in results]
+        if missing:
+            raise Exception(f"Batched translate response missing {len(missing)} of {len(triples)} results")
+        return [results[str(index)] for index in range(1, len(triples) + 1)]
+
+    def translator(self):
+        translator = getattr(self._local, 'translator', None)
+        if translator is None:
+            import httpx
+            from googletrans import Translator
+            # httpx 0.13 only accepts a Timeout object here, not a number of seconds
+            timeout = httpx.Timeout(self.timeout) if self.timeout else None
+            translator = self._local.translator = Translator(timeout=timeout)
+        return translator
+
+
+def _language_code(code):
+    """Normalize a language code the way googletrans.Translator.translate() does."""
+    from googletrans.constants import LANGUAGES, LANGCODES, SPECIAL_CASES
+    code = code.lower().split('_', 1)[0]
+    if code == 'auto' or code in LANGUAGES:
+        return code
+    if code in SPECIAL_CASES:
+        return SPECIAL_CASES[code]
+    if code in LANGCODES:
+        return LANGCODES[code]
+    raise ValueError(f'invalid language: {code}')
+
+
+def _translated_text(parsed):
+    # Same extraction as googletrans.Translator.translate()
+    should_spacing = parsed[1][0][0][3]
+    parts = parsed[1][0][0][5]
+    return (' ' if should_spacing else '').join(part[0] for part in parts)
+
+
+def _error_kind(status_code):
+    # Google answers 429, or 503 with a captcha page, when it throttles us
+    return 'throttled' if status_code in (429, 503) else 'error'
@@ -0,0 +1,103 @@
+# langserver/usage.py
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from . import db
+from .models import TokenUsage
+from .threads import BackgroundThreads
+
+COUNTERS = ('requests', 'segments', 'characters', 'cache_hits', 'bytes_served')
+
+
+class UsageRecorder:
+    """
+    Write-behind per-token usage counters.
+
+    record() only adds to an in-memory dict keyed by (token id, time bucket).
+    A background thread flushes the dict every `flush_interval` seconds, or
+    sooner once `max_pending` keys are waiting, as one batched upsert into
+    the TokenUsage table, so requests never wait on the database write lock.
+    Counters from a failed flush are merged back and retried. Each worker
+    process flushes its own counters; the upsert adds them together.
+    """
+
+    def __init__(self, app, flush_interval=10, max_pending=1000, bucket_seconds=60 * 60):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.bucket_seconds = bucket_seconds
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads = BackgroundThreads(self._work, 'usage-flush', on_start=self._reset)
+
+    def record(self, token_id, **counts):
+        """Add `counts` (see COUNTERS) to the token's current bucket."""
+        self._threads.start()
+        key = (token_id, int(time.time()) // self.bucket_seconds * self.bucket_seconds)
+        with self._lock:
+            row = self._pending.get(key)
+            if row is None:
+                row = self._pending[key] = dict.fromkeys(COUNTERS, 0)
+            for name, value in counts.items():
+                row[name] += value
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Upsert all pending counters in one transaction. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            rows = [dict(token_id=token_id, bucket=datetime.utcfromtimestamp(bucket), **counts)
+                    for (token_id, bucket), counts in pending.items()]
+            with self.app.app_context():
+                try:
+                    db.session.execute(self._upsert(), rows)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    logging.error(f"Usage flush of {len(rows)} rows failed, will retry: {e}")
+                    self._restore(pending)
+                    return 0
+            return len(rows)
+
+    def _upsert(self):
+        if db.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(TokenUsage)
+        return statement.on_conflict_do_update(
+            index_elements=['token_id', 'bucket'],
+            set_={name: getattr(TokenUsage, name) + getattr(statement.excluded, name) for name in COUNTERS},
+        )
+
+    def _restore(self, pending):
+        with self._lock:
+            for key, counts in pending.items():
+                row = self._pending.setdefault(key, dict.fromkeys(COUNTERS, 0))
+                for name, value in counts.items():
+                    row[name] += value
+
+    def _reset(self):
+        # Counters inherited from the parent process are the parent's to flush
+        with self._lock:
+            self._pending = {}
+        atexit.register(self.flush)
+
+    def _work(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Usage flush crashed: {e}")
@@ -0,0 +1,84 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from langserver import app, limiter
+from langserver.assets import StaticAssets
+
+BUNDLE = b'console.log("admin");\n' * 200
+
+class AdminAssetsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        limiter.enabled = False
+        self.addCleanup(setattr, limiter, 'enabled', True)
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.makedirs(os.path.join(root, 'static', 'js'))
+        os.makedirs(os.path.join(root, 'static', 'css'))
+        files = {
+            'index.html': b'<html>admin</html>',
+            'manifest.json': b'{}',
+            'static/js/main.69b7bff0.js': BUNDLE,
+            'static/js/main.69b7bff0.js.map': BUNDLE,
+            'static/css/main.117258ff.css': BUNDLE,
+            'static/css/main.117258ff.css.gz': b'prebuilt',
+        }
+        for name, body in files.items():
+            with open(os.path.join(root, name), 'wb') as f:
+                f.write(body)
+        self.assets = StaticAssets(root)
+        patch = mock.patch('langserver.routes.admin_assets', self.assets)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_hashed_bundle_is_immutable_and_precompressed(self):
+        response = self.app.get('/admin/static/js/main.69b7bff0.js', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertEqual(gzip.decompress(response.data), BUNDLE)
+
+        etag = response.get_etag()[0]
+        response = self.app.get('/admin/static/js/main.69b7bff0.js',
+                                headers={'Accept-Encoding': 'gzip', 'If-None-Match': f'"{etag}"'})
+        self.assertEqual(response.status_code, 304)
+
+    def test_indexed_lazily(self):
+        self.assertIsNone(self.assets.assets)
+        self.app.get('/admin').close()
+        self.assertEqual(len(self.assets.assets), 5)
+
+    def test_precompressed_variant_loaded_and_maps_not_compressed(self):
+        response = self.app.get('/admin/static/css/main.117258ff.css', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.data, b'prebuilt')
+        response = self.app.get('/admin/static/js/main.69b7bff0.js.map', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        response.close()
+
+    def test_identity_served_from_file(self):
+        response = self.app.get('/admin/static/js/main.69b7bff0.js')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.data, BUNDLE)
+        self.assertTrue(response.get_etag()[0])
+        response.close()
+
+    def test_spa_routes_and_root_files(self):
+        for path in ('/admin', '/admin/tokens', '/admin/tokens/edit'):
+            response = self.app.get(path)
+            self.assertEqual(response.data, b'<html>admin</html>')
+            self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+            response.close()
+        response = self.app.get('/admin/manifest.json')
+        self.assertEqual(response.data, b'{}')
+        response.close()
+        self.assertEqual(self.app.get('/admin/static/js/missing.js').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
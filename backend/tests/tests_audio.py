@@ -0,0 +1,118 @@
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from langserver import app, limiter, segment_cache
+from langserver.audio import Transcoder, join_mp3, mp3_frame_length, strip_mp3
+
+# One silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, stereo, 417 bytes
+FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+INFO_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 32 + b'Info' + b'\x00' * 377
+ID3 = b'ID3\x04\x00\x00\x00\x00\x00\x05' + b'TIT2\x00'
+ID3V1 = b'TAG' + b'\x00' * 125
+
+FAKE_FFMPEG = '''#!/bin/sh
+echo call >> "$(dirname "$0")/calls"
+while [ $# -gt 0 ]; do
+    [ "$1" = "-c:a" ] && codec="$2"
+    shift
+done
+printf "%s:" "$codec"; cat
+'''
+
+def write_script(directory, name, body):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(body)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+class MP3TestCase(unittest.TestCase):
+
+    def test_frame_length(self):
+        self.assertEqual(mp3_frame_length(FRAME[:4]), 417)
+        self.assertIsNone(mp3_frame_length(b'mp3!'))
+
+    def test_strip_tags_and_info_frame(self):
+        self.assertEqual(strip_mp3(ID3 + INFO_FRAME + FRAME * 2 + ID3V1), FRAME * 2)
+        self.assertEqual(strip_mp3(FRAME * 2), FRAME * 2)
+
+    def test_non_mp3_unchanged(self):
+        self.assertEqual(strip_mp3(b'[en:horse]'), b'[en:horse]')
+
+    def test_join_at_frame_boundaries(self):
+        self.assertEqual(join_mp3([ID3 + INFO_FRAME + FRAME, INFO_FRAME + FRAME * 2]), FRAME * 3)
+
+class TranscodeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.transcoder = Transcoder(threading.BoundedSemaphore(2),
+                                     binary=write_script(self.directory, 'ffmpeg', FAKE_FFMPEG))
+
+    def calls(self):
+        path = os.path.join(self.directory, 'calls')
+        return len(open(path).readlines()) if os.path.exists(path) else 0
+
+    def test_transcode(self):
+        self.assertEqual(self.transcoder.formats(), ['mp3', 'opus', 'aac'])
+        self.assertEqual(self.transcoder.transcode(b'mp3', 'opus'), b'libopus:mp3')
+        self.assertEqual(self.transcoder.transcode(b'mp3', 'aac'), b'aac:mp3')
+
+    def test_without_ffmpeg_only_mp3(self):
+        with mock.patch('shutil.which', return_value=None):
+            self.assertEqual(Transcoder(threading.BoundedSemaphore(1)).formats(), ['mp3'])
+
+    def test_speech_formats(self):
+        client = app.test_client()
+        headers = {'Authorization': app.config['ADMIN_TOKEN']}
+        limiter.enabled = False
+        self.addCleanup(setattr, limiter, 'enabled', True)
+        segment_cache.clear()
+        patches = [
+            mock.patch('langserver.routes.transcoder', self.transcoder),
+            mock.patch('langserver.routes.generate_tts', side_effect=lambda language, text: f"[{language}]".encode()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        def speak(payload, **kwargs):
+            return client.post('/generate-speech', headers=dict(headers, **kwargs), data=json.dumps(payload),
+                               content_type='application/json')
+
+        payload = {'localization': {'en': 'horse', 'de': 'Pferd'}}
+        response = speak(dict(payload, format='ogg'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'audio/ogg')
+        self.assertEqual(response.data, b'libopus:[en]libopus:[de]')
+        self.assertIn('Accept', response.vary)
+        self.assertEqual(self.calls(), 2)
+
+        # Transcoded segments are cached per format
+        self.assertEqual(speak(dict(payload, format='opus')).data, b'libopus:[en]libopus:[de]')
+        self.assertEqual(self.calls(), 2)
+
+        response = speak(payload, Accept='audio/aac, audio/mpeg;q=0.5')
+        self.assertEqual(response.mimetype, 'audio/aac')
+        self.assertEqual(response.data, b'aac:[en]aac:[de]')
+
+        mp3 = speak(payload, Accept='*/*')
+        self.assertEqual(mp3.mimetype, 'audio/mpeg')
+        self.assertEqual(mp3.data, b'[en][de]')
+        self.assertNotEqual(mp3.get_etag(), response.get_etag())
+        self.assertTrue(response.get_etag()[1])
+
+        # Other encoder settings give other bytes, so another validator
+        self.transcoder.bitrates = {'aac': '96k'}
+        self.assertNotEqual(speak(payload, Accept='audio/aac').get_etag(), response.get_etag())
+
+        self.assertEqual(speak(dict(payload, format='flac')).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import threading
+import unittest
+from langserver.audio_store import AudioStore
+
+class AudioStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = AudioStore(self.tmp.name, 1024)
+        self.wait_for_background_scans()
+
+    def tearDown(self):
+        self.wait_for_background_scans()
+        self.tmp.cleanup()
+
+    def wait_for_background_scans(self):
+        for thread in threading.enumerate():
+            if thread.name.startswith('audio-store-'):
+                thread.join()
+
+    def test_round_trip(self):
+        digest = AudioStore.digest('gtts', 'en', 'horse')
+        self.assertIsNone(self.store.get(digest))
+        self.store.put(digest, b'mp3-bytes')
+        self.assertEqual(self.store.get(digest), b'mp3-bytes')
+        self.assertTrue(os.path.exists(self.store.path(digest)))
+
+    def test_digest_normalizes_input(self):
+        self.assertEqual(AudioStore.digest('gtts', 'zh-TW', ' 馬 '), AudioStore.digest('gtts', 'zh-tw', '馬'))
+        self.assertNotEqual(AudioStore.digest('gtts', 'en', 'horse'), AudioStore.digest('espeak', 'en', 'horse'))
+
+    def test_survives_restart(self):
+        digest = AudioStore.digest('gtts', 'de', 'Pferd')
+        self.store.put(digest, b'pferd')
+        reopened = AudioStore(self.tmp.name, 1024)
+        self.assertEqual(reopened.get(digest), b'pferd')
+
+    def test_evicts_oldest_when_over_capacity(self):
+        digests = [AudioStore.digest('gtts', 'en', str(i)) for i in range(3)]
+        for i, digest in enumerate(digests):
+            self.store.put(digest, b'x' * 400)
+            os.utime(self.store.path(digest), (i, i))
+        self.store._evict()
+        self.assertIsNone(self.store.get(digests[0]))
+        self.assertIsNotNone(self.store.get(digests[2]))
+
+    def test_disabled_store(self):
+        store = AudioStore(self.tmp.name, 0)
+        digest = AudioStore.digest('gtts', 'en', 'horse')
+        store.put(digest, b'abc')
+        self.assertIsNone(store.get(digest))
+
+if __name__ == '__main__':
+    unittest.main()
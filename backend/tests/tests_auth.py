@@ -0,0 +1,80 @@
+import unittest
+from langserver import app, db, limiter
+from langserver.auth import TokenCache
+from langserver.models import APIToken
+
+class TokenCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        limiter.enabled = False
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        limiter.enabled = True
+        with app.app_context():
+            APIToken.query.delete()
+            db.session.commit()
+
+    def add_token(self, token_id, rate_limit=5):
+        response = self.app.post('/add-token', json={'id': token_id, 'rate_limit': rate_limit})
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['token']
+
+    def test_lookup_is_cached(self):
+        token = self.add_token('cached')
+        hashed = APIToken.hash_token(token, app.config['ADMIN_TOKEN'])
+        cache = TokenCache(100, ttl=60, negative_ttl=60, sync_interval=60)
+        with app.app_context():
+            self.assertEqual(cache.lookup(hashed), ('cached', 5))
+            APIToken.query.delete()
+            db.session.commit()
+            self.assertEqual(cache.lookup(hashed), ('cached', 5))
+
+    def test_invalid_token_is_negatively_cached(self):
+        cache = TokenCache(100, ttl=60, negative_ttl=60, sync_interval=60)
+        with app.app_context():
+            self.assertIsNone(cache.lookup('missing'))
+        self.assertEqual(cache.negative.stats()['entries'], 1)
+
+    def test_negative_cache_is_smaller(self):
+        cache = TokenCache(100, ttl=60, negative_ttl=60, sync_interval=60)
+        self.assertEqual(cache.negative.max_bytes, 10)
+        cache = TokenCache(100, ttl=60, negative_ttl=60, negative_entries=3, sync_interval=60)
+        with app.app_context():
+            for index in range(5):
+                self.assertIsNone(cache.lookup(f'missing-{index}'))
+        self.assertEqual(cache.negative.stats()['entries'], 3)
+        self.assertEqual(cache.positive.max_bytes, 100)
+
+    def test_invalidation_reaches_other_workers(self):
+        token = self.add_token('shared')
+        hashed = APIToken.hash_token(token, app.config['ADMIN_TOKEN'])
+        other_worker = TokenCache(100, ttl=60, negative_ttl=60, sync_interval=0)
+        with app.app_context():
+            self.assertEqual(other_worker.lookup(hashed).rate_limit, 5)
+
+        response = self.app.post('/edit-token', json={'id': 'shared', 'rate_limit': 9})
+        self.assertEqual(response.status_code, 200)
+        with app.app_context():
+            self.assertEqual(other_worker.lookup(hashed).rate_limit, 9)
+
+    def test_revoked_token_rejected(self):
+        token = self.add_token('revoked')
+        self.assertEqual(self.app.get('/list-tokens', headers={'Authorization': token}).status_code, 200)
+        self.app.post('/revoke-token', json={'token': 'revoked'})
+        self.assertEqual(self.app.get('/list-tokens', headers={'Authorization': token}).status_code, 401)
+
+    def test_token_rate_limit_enforced(self):
+        token = self.add_token('limited', rate_limit=1)
+        first = self.app.get('/list-tokens', headers={'Authorization': token})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers['X-RateLimit-Limit'], '1')
+        second = self.app.get('/list-tokens', headers={'Authorization': token})
+        self.assertEqual(second.status_code, 429)
+        self.assertIn('Retry-After', second.headers)
+
+if __name__ == '__main__':
+    unittest.main()
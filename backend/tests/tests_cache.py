@@ -0,0 +1,44 @@
+import unittest
+from unittest import mock
+from langserver.cache import LRUCache, normalize_text, segment_key
+
+class LRUCacheTestCase(unittest.TestCase):
+
+    def test_get_set(self):
+        cache = LRUCache(100)
+        cache.set(('en', 'horse'), b'abc')
+        self.assertEqual(cache.get(('en', 'horse')), b'abc')
+        self.assertIsNone(cache.get(('de', 'pferd')))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(10)
+        cache.set('a', b'12345')
+        cache.set('b', b'12345')
+        cache.get('a')
+        cache.set('c', b'12345')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'12345')
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.stats()['bytes'], 10)
+
+    def test_oversized_value_not_cached(self):
+        cache = LRUCache(4)
+        cache.set('a', b'12345')
+        self.assertEqual(len(cache), 0)
+
+    def test_ttl_expiry(self):
+        cache = LRUCache(100, ttl=10)
+        with mock.patch('langserver.cache.time.monotonic', return_value=1000):
+            cache.set('a', b'1')
+        with mock.patch('langserver.cache.time.monotonic', return_value=1011):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+    def test_segment_key_normalization(self):
+        self.assertEqual(segment_key('zh-TW', '  馬 '), segment_key('zh-tw', '馬'))
+        self.assertEqual(normalize_text('the  quick\nfox'), 'the quick fox')
+
+if __name__ == '__main__':
+    unittest.main()
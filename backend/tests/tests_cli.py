@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from langserver import app
+
+class WarmCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.runner = app.test_cli_runner()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_jsonl_is_resumable(self):
+        path = self.write('vocab.jsonl', '\n'.join(json.dumps(payload) for payload in [
+            {'localization': {'en': 'horse', 'zh-TW': '馬'}},
+            {'text': 'dog', 'language': 'en', 'translations': ['de']},
+        ]))
+        with mock.patch('langserver.cli.synthesize_segment') as synthesize:
+            result = self.runner.invoke(args=['warm-cache', path, '--concurrency', '2'])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertEqual(synthesize.call_count, 4)
+            self.assertIn('2/2 records, 4 segments, 0 failed', result.output)
+
+            result = self.runner.invoke(args=['warm-cache', path])
+            self.assertIn('Warming 0 records (2 already done)', result.output)
+            self.assertEqual(synthesize.call_count, 4)
+
+    def test_malformed_lines_are_skipped(self):
+        path = self.write('vocab.jsonl', '\n'.join([
+            json.dumps({'localization': {'en': 'horse'}}),
+            '{"localization": {"en": "dog"',
+            '["not", "an", "object"]',
+            json.dumps({'localization': {'en': 'cat'}}),
+        ]))
+        with mock.patch('langserver.cli.synthesize_segment') as synthesize:
+            result = self.runner.invoke(args=['warm-cache', path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Line 2: skipped, invalid JSON', result.output)
+        self.assertIn('Line 3: skipped, not a JSON object', result.output)
+        self.assertEqual(synthesize.call_count, 2)
+
+    def test_resume_matches_records_not_lines(self):
+        horse = json.dumps({'localization': {'en': 'horse'}})
+        dog = json.dumps({'id': 7, 'localization': {'en': 'dog'}})
+        path = self.write('vocab.jsonl', f"{horse}\n{dog}\n")
+        with mock.patch('langserver.cli.synthesize_segment'):
+            self.runner.invoke(args=['warm-cache', path])
+
+        # New records before the old ones, and an edited record keeping its id
+        edited = json.dumps({'id': 7, 'localization': {'en': 'dog', 'de': 'Hund'}})
+        self.write('vocab.jsonl', '\n'.join([json.dumps({'localization': {'en': 'cat'}}), horse, edited]))
+        with mock.patch('langserver.cli.synthesize_segment') as synthesize:
+            result = self.runner.invoke(args=['warm-cache', path])
+        self.assertIn('Warming 1 records', result.output)
+        self.assertEqual([call.args[0].text for call in synthesize.call_args_list], ['cat'])
+
+    def test_csv_shapes(self):
+        path = self.write('vocab.csv', 'text,language,translations\nhorse,en,de|fr\n')
+        with mock.patch('langserver.cli.synthesize_segment') as synthesize:
+            self.runner.invoke(args=['warm-cache', path])
+        self.assertEqual([call.args[0].language for call in synthesize.call_args_list], ['en', 'de', 'fr'])
+
+        path = self.write('localized.csv', 'en,de\nhorse,Pferd\ndog,\n')
+        with mock.patch('langserver.cli.synthesize_segment') as synthesize:
+            self.runner.invoke(args=['warm-cache', path, '--concurrency', '1'])
+        self.assertEqual(synthesize.call_count, 3)
+
+    def test_failed_records_are_retried(self):
+        path = self.write('vocab.jsonl', json.dumps({'localization': {'en': 'horse'}}))
+        with mock.patch('langserver.cli.synthesize_segment', side_effect=Exception('upstream failed')):
+            result = self.runner.invoke(args=['warm-cache', path])
+        self.assertIn('1 failed', result.output)
+        with mock.patch('langserver.cli.synthesize_segment') as synthesize:
+            self.runner.invoke(args=['warm-cache', path])
+        self.assertEqual(synthesize.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
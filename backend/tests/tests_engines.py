@@ -0,0 +1,121 @@
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from langserver import env_pins
+from langserver.engines import TTSEngine, EspeakEngine, EngineRouter
+
+FAKE_ESPEAK = '''#!/bin/sh
+case "$1" in
+    --version) echo "eSpeak NG text-to-speech: 1.51 test"; exit 0 ;;
+    --voices)
+        echo "Pty Language       Age/Gender VoiceName          File                 Other Languages"
+        echo " 5  de              --/M      German             gmw/de"
+        echo " 2  en-gb           --/M      English_(Great_Britain) gmw/en"
+        echo " 5  cmn             --/M      Chinese_(Mandarin) sit/cmn"
+        exit 0 ;;
+    -v) printf "WAV[%s]" "$2"; cat; exit 0 ;;
+esac
+exit 1
+'''
+
+FAKE_LAME = '''#!/bin/sh
+printf "MP3:"; cat
+'''
+
+def write_script(directory, name, body):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(body)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+class FakeEngine(TTSEngine):
+
+    def __init__(self, name, languages, available=True):
+        super().__init__(threading.BoundedSemaphore(1))
+        self.name = name
+        self._languages = frozenset(languages)
+        self._available = available
+
+    def languages(self):
+        return self._languages
+
+    def available(self):
+        return self._available
+
+class EspeakEngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.engine = EspeakEngine(threading.BoundedSemaphore(2),
+                                   binary=write_script(directory, 'espeak-ng', FAKE_ESPEAK),
+                                   encoder=write_script(directory, 'lame', FAKE_LAME))
+
+    def test_voices_and_aliases(self):
+        self.assertTrue(self.engine.available())
+        self.assertIn('1.51', self.engine.version)
+        self.assertTrue(self.engine.supports('de'))
+        self.assertTrue(self.engine.supports('EN'))
+        self.assertEqual(self.engine.voice('en'), 'en-gb')
+        self.assertEqual(self.engine.voice('zh-TW'), 'cmn')
+        self.assertFalse(self.engine.supports('fr'))
+
+    def test_synthesize_pipes_wav_into_encoder(self):
+        self.assertEqual(self.engine.synthesize('zh-TW', '馬'), 'MP3:WAV[cmn]馬'.encode())
+
+    def test_unavailable_without_binary(self):
+        engine = EspeakEngine(threading.BoundedSemaphore(1), binary='/nonexistent/espeak-ng', encoder='/bin/cat')
+        self.assertFalse(engine.available())
+        self.assertFalse(engine.supports('en'))
+
+    @unittest.skipUnless(shutil.which('espeak-ng') and (shutil.which('lame') or shutil.which('ffmpeg')),
+                         'espeak-ng and an MP3 encoder are not installed')
+    def test_real_espeak(self):
+        engine = EspeakEngine(threading.BoundedSemaphore(1))
+        audio = engine.synthesize('en', 'horse')
+        self.assertTrue(audio.startswith(b'ID3') or audio[:2] == b'\xff\xfb' or len(audio) > 100)
+
+class EngineRouterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.remote = FakeEngine('remote', {'en', 'zh-tw'})
+        self.local = FakeEngine('local', {'en', 'de'})
+        self.router = EngineRouter([self.remote, self.local])
+
+    def test_supported_engines_in_config_order_until_measured(self):
+        self.assertEqual(self.router.candidates('en'), [self.remote, self.local])
+        self.assertEqual(self.router.candidates('DE'), [self.local])
+        self.assertEqual(self.router.candidates('fr'), [])
+
+    def test_fastest_engine_first(self):
+        self.router.record(self.remote, 0.5)
+        self.router.record(self.local, 0.05)
+        self.assertEqual(self.router.candidates('en'), [self.local, self.remote])
+
+    def test_pins_win_over_latency(self):
+        router = EngineRouter([self.remote, self.local], pins={'EN': 'remote'})
+        router.record(self.remote, 0.5)
+        router.record(self.local, 0.05)
+        self.assertEqual(router.candidates('en'), [self.remote, self.local])
+
+    def test_pins_are_normalized(self):
+        router = EngineRouter([self.remote, self.local], pins={' ZH_tw ': ' Local'})
+        self.assertEqual(router.candidates('zh-TW'), [self.remote])
+        router = EngineRouter([self.remote, self.local], pins={'en': 'local'})
+        self.assertEqual(router.candidates('EN'), [self.local, self.remote])
+
+    def test_env_pins(self):
+        with mock.patch.dict(os.environ, {'TTS_ENGINE_PINS': 'EN: espeak , zh_TW:GTTS,bogus,:gtts'}):
+            self.assertEqual(env_pins('TTS_ENGINE_PINS'), {'en': 'espeak', 'zh-tw': 'gtts'})
+
+    def test_unavailable_engines_skipped(self):
+        self.remote._available = False
+        self.assertEqual(self.router.candidates('en'), [self.local])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from unittest import mock
+from langserver import app, language_registry
+from langserver.engines import GTTSEngine
+from langserver.languages import LanguageRegistry, normalize_code
+from langserver.routes import Segment, plan_segments, synthesize_segment
+
+class LanguageRegistryTestCase(unittest.TestCase):
+
+    def test_normalize_code(self):
+        self.assertEqual(normalize_code(' zh_TW '), 'zh-tw')
+
+    def test_case_and_separator_insensitive(self):
+        self.assertEqual(language_registry.tts('ZH_tw'), 'zh-TW')
+        self.assertEqual(language_registry.tts('En'), 'en')
+        self.assertEqual(language_registry.translation('zh-TW'), 'zh-tw')
+        self.assertIsNone(language_registry.tts('xx'))
+
+    def test_aliases(self):
+        self.assertEqual(language_registry.tts('he'), 'iw')
+        self.assertEqual(language_registry.tts('zh-Hant'), 'zh-TW')
+        # gTTS speaks plain zh itself, so the alias only applies to translation
+        self.assertEqual(language_registry.tts('zh'), 'zh')
+        self.assertEqual(language_registry.translation('zh'), 'zh-cn')
+
+    def test_first_engine_decides_canonical_code(self):
+        class LocalEngine:
+            def language_names(self):
+                return {'zh-tw': 'zh-tw', 'cmn': 'cmn'}
+
+        gtts_engine = next(engine for engine in language_registry.engines if isinstance(engine, GTTSEngine))
+        registry = LanguageRegistry([gtts_engine, LocalEngine()])
+        self.assertEqual(registry.tts('zh-tw'), 'zh-TW')
+        self.assertEqual(registry.tts('CMN'), 'cmn')
+
+class PlanSegmentsTestCase(unittest.TestCase):
+
+    def test_canonical_codes(self):
+        segments = plan_segments({'text': 'horse', 'language': 'EN', 'translations': ['zh_tw', 'xx']})
+        self.assertEqual([(segment.language, segment.source_language) for segment in segments],
+                         [('en', None), ('zh-TW', 'en')])
+
+    def test_translation_codes_differ_from_tts_codes(self):
+        # "zh" is zh-cn to the translator, and "he" is spoken as "iw" but translated as "he"
+        segments = plan_segments({'text': '马', 'language': 'zh', 'translations': ['he']})
+        self.assertEqual(segments[1], Segment('iw', '马', 'zh-cn', 'he'))
+
+        with mock.patch('langserver.routes.translate_text', return_value='סוס') as translate, \
+                mock.patch('langserver.routes.generate_tts', return_value=b'mp3') as tts:
+            self.assertEqual(synthesize_segment(segments[1]), b'mp3')
+        translate.assert_called_once_with('马', 'zh-cn', 'he')
+        tts.assert_called_once_with('iw', 'סוס')
+
+    def test_localization_codes(self):
+        segments = plan_segments({'localization': {'ZH-tw': '馬', 'xx': '?'}})
+        self.assertEqual([segment.language for segment in segments], ['zh-TW'])
+
+class LanguageEndpointsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+
+    def test_languages(self):
+        response = self.app.get('/languages')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['tts']['zh-TW'], 'Chinese (Mandarin/Taiwan)')
+        self.assertIn('de', response.json['translation'])
+        self.assertIn('max-age', response.headers['Cache-Control'])
+
+    def test_readyz(self):
+        response = self.app.get('/readyz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['status'], 'ready')
+        self.assertTrue(response.json['engines']['gtts'])
+
+    def test_readyz_ignores_open_breaker(self):
+        from langserver import tts_caller
+        for _ in range(tts_caller.breaker.failure_threshold):
+            tts_caller.breaker.record_failure()
+        self.addCleanup(tts_caller.breaker.record_success)
+        response = self.app.get('/readyz')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json['engines']['gtts'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+from unittest import mock
+from langserver import app, limiter, segment_cache, upstream
+
+class MetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        limiter.enabled = False
+        segment_cache.clear()
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def test_metrics_endpoint(self):
+        with mock.patch.object(upstream, 'synthesize', return_value=b'mp3'), \
+                mock.patch('langserver.routes.audio_store.enabled', False):
+            self.app.post('/generate-speech', headers={'Authorization': app.config['ADMIN_TOKEN']},
+                          json={'localization': {'en': 'metrics test'}})
+
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.get_data(as_text=True)
+        self.assertIn('langserver_request_duration_seconds_count{endpoint="generate_speech",status="200"}', body)
+        self.assertIn('langserver_cache_lookups_total{cache="segment",result="miss"}', body)
+        self.assertIn('langserver_tts_duration_seconds_count{engine="gtts",language="en"}', body)
+        self.assertIn('langserver_scheduler_wait_seconds_count', body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from langserver import app, db
+from langserver.models import APIToken
+from langserver.ratelimit import MemoryBucketStorage, SQLiteBucketStorage, TokenRateLimiter
+
+class TokenRateLimiterTestCase(unittest.TestCase):
+
+    def check_storage(self, storage):
+        limiter = TokenRateLimiter(storage)
+        with mock.patch('langserver.ratelimit.time.time', return_value=1000.0):
+            results = [limiter.hit('tenant', 3) for _ in range(4)]
+        self.assertEqual([result.allowed for result in results], [True, True, True, False])
+        self.assertEqual(results[2].remaining, 0)
+        self.assertEqual(results[3].retry_after, 20)
+
+        # One token refills every 20 seconds at 3 per minute
+        with mock.patch('langserver.ratelimit.time.time', return_value=1020.0):
+            self.assertTrue(limiter.hit('tenant', 3).allowed)
+            self.assertFalse(limiter.hit('tenant', 3).allowed)
+            self.assertTrue(limiter.hit('other', 3).allowed)
+
+    def test_memory_storage(self):
+        self.check_storage(MemoryBucketStorage())
+
+    def test_sqlite_storage_is_shared(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'ratelimit.db')
+            self.check_storage(SQLiteBucketStorage(path))
+            with mock.patch('langserver.ratelimit.time.time', return_value=1020.0):
+                self.assertFalse(TokenRateLimiter(SQLiteBucketStorage(path)).hit('tenant', 3).allowed)
+
+    def test_headers(self):
+        limiter = TokenRateLimiter(MemoryBucketStorage())
+        limiter.hit('tenant', 1)
+        headers = TokenRateLimiter.headers(limiter.hit('tenant', 1))
+        self.assertEqual(headers['X-RateLimit-Limit'], '1')
+        self.assertEqual(headers['X-RateLimit-Remaining'], '0')
+        self.assertIn('Retry-After', headers)
+
+class RouteLimitsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.token = 'route-limits-token'
+        patch = mock.patch('langserver.routes.token_rate_limiter', TokenRateLimiter(MemoryBucketStorage()))
+        patch.start()
+        self.addCleanup(patch.stop)
+        # Freeze the bucket so no token is refilled while the test runs
+        clock = mock.patch('langserver.ratelimit.time.time', return_value=1000.0)
+        clock.start()
+        self.addCleanup(clock.stop)
+        with app.app_context():
+            db.session.add(APIToken(id='route-limits', rate_limit=1000,
+                                    token=APIToken.hash_token(self.token, app.config['ADMIN_TOKEN'])))
+            db.session.commit()
+
+    def tearDown(self):
+        with app.app_context():
+            APIToken.query.filter_by(id='route-limits').delete()
+            db.session.commit()
+
+    def test_token_limit_is_the_only_limit_on_speech(self):
+        with mock.patch('langserver.routes.generate_tts', return_value=b'mp3'):
+            for _ in range(15):
+                response = self.app.post('/generate-speech', headers={'Authorization': self.token},
+                                         json={'localization': {'en': 'limits'}})
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-RateLimit-Remaining'], '985')
+
+    def test_route_limit_checked_before_token_is_charged(self):
+        statuses = [self.app.get('/list-tokens?limit=1', headers={'Authorization': self.token}).status_code
+                    for _ in range(12)]
+        self.assertEqual(statuses, [200] * 10 + [429] * 2)
+        response = self.app.post('/generate-speech', headers={'Authorization': self.token},
+                                 json={'localization': {}})
+        # Only the ten admitted listings and this request were charged
+        self.assertEqual(response.headers['X-RateLimit-Remaining'], '989')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import threading
+import time
+import unittest
+from langserver.resilience import CircuitBreaker, CircuitOpen, LatencyTracker, ResilientCaller, UpstreamThrottled
+
+
+def caller(**kwargs):
+    breaker = CircuitBreaker('test', failure_threshold=kwargs.pop('failure_threshold', 2), reset_timeout=kwargs.pop('reset_timeout', 60))
+    options = dict(deadline=1, retries=2, backoff=0, hedge=False, hedge_workers=4)
+    options.update(kwargs)
+    return ResilientCaller('test', breaker, **options)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+
+    def test_opens_after_threshold_and_recovers(self):
+        breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        breaker.allow()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        with self.assertRaises(CircuitOpen):
+            breaker.allow()
+
+        time.sleep(0.06)
+        breaker.allow()
+        # Only one trial call is let through while half-open
+        with self.assertRaises(CircuitOpen):
+            breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=0.05)
+        for _ in range(3):
+            breaker.record_failure()
+        time.sleep(0.06)
+        breaker.allow()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+
+
+class ResilientCallerTestCase(unittest.TestCase):
+
+    def test_retries_transient_errors(self):
+        attempts = []
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ConnectionError('reset')
+            return 'ok'
+
+        self.assertEqual(caller().call(flaky), 'ok')
+        self.assertEqual(len(attempts), 3)
+
+    def test_permanent_errors_are_not_retried(self):
+        attempts = []
+        def invalid():
+            attempts.append(1)
+            raise ValueError('invalid language')
+
+        resilient = caller()
+        with self.assertRaises(ValueError):
+            resilient.call(invalid)
+        self.assertEqual(len(attempts), 1)
+        self.assertEqual(resilient.breaker.state, 'closed')
+
+    def test_throttling_opens_circuit_without_retries(self):
+        attempts = []
+        def throttled():
+            attempts.append(1)
+            raise UpstreamThrottled('429')
+
+        resilient = caller()
+        for _ in range(2):
+            with self.assertRaises(UpstreamThrottled):
+                resilient.call(throttled)
+        self.assertEqual(len(attempts), 2)
+        with self.assertRaises(CircuitOpen):
+            resilient.call(throttled)
+        self.assertEqual(len(attempts), 2)
+
+    def test_deadline(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        resilient = caller(deadline=0.05, retries=0)
+        started = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            resilient.call(release.wait)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_hedges_slow_calls(self):
+        resilient = caller(hedge=True, hedge_min_delay=0.01)
+        for _ in range(20):
+            resilient.latency.record(0.01)
+
+        calls = []
+        lock = threading.Lock()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        def first_call_hangs():
+            with lock:
+                calls.append(1)
+                first = len(calls) == 1
+            if first:
+                release.wait()
+                return 'slow'
+            return 'fast'
+
+        self.assertEqual(resilient.call(first_call_hangs), 'fast')
+        self.assertEqual(len(calls), 2)
+
+    def test_hedge_needs_a_free_slot(self):
+        slots = threading.BoundedSemaphore(2)
+        resilient = caller(hedge=True, hedge_min_delay=0.01, slots=slots)
+        for _ in range(20):
+            resilient.latency.record(0.01)
+
+        calls = []
+        def slow():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'ok'
+
+        # The caller holds one slot for the primary; the hedge takes the other
+        with slots:
+            self.assertEqual(resilient.call(slow), 'ok')
+        self.assertEqual(len(calls), 2)
+        time.sleep(0.1)
+        # Every slot is back once the hedge finishes
+        for _ in range(2):
+            self.assertTrue(slots.acquire(blocking=False))
+
+        # No free slot: the primary runs alone
+        calls.clear()
+        self.assertEqual(resilient.call(slow), 'ok')
+        self.assertEqual(len(calls), 1)
+
+
+class LatencyTrackerTestCase(unittest.TestCase):
+
+    def test_percentile_needs_samples(self):
+        tracker = LatencyTracker()
+        self.assertIsNone(tracker.percentile(0.95))
+        for value in range(100):
+            tracker.record(value)
+        self.assertEqual(tracker.percentile(0.95), 95)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import threading
+import unittest
+from langserver.scheduler import SchedulerBusy, SpeechScheduler
+
+class SpeechSchedulerTestCase(unittest.TestCase):
+
+    def test_results_in_submission_order(self):
+        scheduler = SpeechScheduler(4, 100, translate_concurrency=1, tts_concurrency=1)
+        futures = scheduler.submit_group(lambda n: n * n, range(10))
+        self.assertEqual([future.result(timeout=5) for future in futures], [n * n for n in range(10)])
+
+    def test_exceptions_are_captured(self):
+        scheduler = SpeechScheduler(1, 10, translate_concurrency=1, tts_concurrency=1)
+        future = scheduler.submit(lambda: 1 / 0)
+        with self.assertRaises(ZeroDivisionError):
+            future.result(timeout=5)
+
+    def test_rejects_when_queue_full(self):
+        started, release = threading.Event(), threading.Event()
+        scheduler = SpeechScheduler(1, 3, translate_concurrency=1, tts_concurrency=1, retry_after=7)
+        blocked = scheduler.submit(lambda: started.set() or release.wait())
+        started.wait(5)
+        scheduler.submit_group(lambda n: n, range(3))
+        with self.assertRaises(SchedulerBusy) as context:
+            scheduler.submit_group(lambda n: n, range(2))
+        self.assertEqual(context.exception.retry_after, 7)
+        release.set()
+        blocked.result(timeout=5)
+
+    def test_groups_are_served_round_robin(self):
+        started, release = threading.Event(), threading.Event()
+        order = []
+        scheduler = SpeechScheduler(1, 100, translate_concurrency=1, tts_concurrency=1)
+        blocked = scheduler.submit(lambda: started.set() or release.wait())
+        started.wait(5)
+        large = scheduler.submit_group(order.append, ['a1', 'a2', 'a3'])
+        small = scheduler.submit_group(order.append, ['b1'])
+        release.set()
+        for future in [blocked] + large + small:
+            future.result(timeout=5)
+        self.assertEqual(order, ['a1', 'b1', 'a2', 'a3'])
+
+    def test_nested_map_does_not_deadlock(self):
+        scheduler = SpeechScheduler(1, 100, translate_concurrency=1, tts_concurrency=1)
+        outer = scheduler.submit(lambda: scheduler.map(lambda n: n + 1, range(5)))
+        self.assertEqual(outer.result(timeout=5), [1, 2, 3, 4, 5])
+        self.assertEqual(scheduler.stats()['pending'], 0)
+
+    def test_map_runs_inline_when_queue_full(self):
+        scheduler = SpeechScheduler(1, 2, translate_concurrency=1, tts_concurrency=1)
+        self.assertEqual(scheduler.map(str, range(4)), ['0', '1', '2', '3'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from langserver.singleflight import SingleFlight
+
+class SingleFlightTestCase(unittest.TestCase):
+
+    def test_concurrent_calls_are_coalesced(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def slow(value):
+            calls.append(value)
+            release.wait(5)
+            return value.upper()
+
+        with ThreadPoolExecutor(5) as executor:
+            futures = [executor.submit(flight.do, ('tts', 'en', 'horse'), slow, 'horse') for _ in range(5)]
+            while flight.stats()['coalesced'] < 4:
+                pass
+            release.set()
+            results = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual(results, ['HORSE'] * 5)
+        self.assertEqual(calls, ['horse'])
+        self.assertEqual(flight.stats(), {'calls': 1, 'coalesced': 4, 'inflight': 0})
+
+    def test_exception_is_shared_and_key_released(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do('key', int, 'not a number')
+        self.assertEqual(flight.do('key', int, '42'), 42)
+
+if __name__ == '__main__':
+    unittest.main()
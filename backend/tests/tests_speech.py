@@ -0,0 +1,354 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+import zipfile
+from unittest import mock
+from langserver import app, limiter, segment_cache
+from langserver.scheduler import SchedulerBusy
+
+def fake_tts(language, text):
+    return f"[{language}:{text}]".encode()
+
+def fake_translate(original_text, original_lang, target_lang):
+    return f"{original_text}@{target_lang}"
+
+class SpeechTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        self.headers = {'Authorization': app.config['ADMIN_TOKEN']}
+        limiter.enabled = False
+        segment_cache.clear()
+        patches = [
+            mock.patch('langserver.routes.generate_tts', side_effect=fake_tts),
+            mock.patch('langserver.routes.translate_text', side_effect=fake_translate),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        limiter.enabled = True
+
+    def post(self, url, payload):
+        # Serialize ourselves; the test client's JSON provider sorts keys and would hide ordering bugs
+        return self.app.post(url, headers=self.headers, data=json.dumps(payload), content_type='application/json')
+
+class GenerateSpeechTestCase(SpeechTestCase):
+
+    def test_localization_in_request_order(self):
+        response = self.post('/generate-speech', {'localization': {'zh-TW': '馬', 'en': 'horse', 'de': 'Pferd'}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, '[zh-TW:馬][en:horse][de:Pferd]'.encode())
+
+    def test_translations_in_request_order(self):
+        response = self.post('/generate-speech', {'text': 'horse', 'language': 'en', 'translations': ['zh-TW', 'de']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b'[en:horse][zh-TW:horse@zh-tw][de:horse@de]')
+
+    def test_invalid_primary_language(self):
+        response = self.post('/generate-speech', {'text': 'horse', 'language': 'xx', 'translations': ['de']})
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_string_codes_rejected(self):
+        for payload in ({'text': 'horse', 'language': 5, 'translations': ['de']},
+                        {'text': 'horse', 'language': 'en', 'translations': [1]},
+                        {'text': 'horse', 'language': 'en', 'translations': 'de'}):
+            response = self.post('/generate-speech', payload)
+            self.assertEqual(response.status_code, 400, payload)
+
+    def test_non_string_text_rejected(self):
+        for payload in ({'localization': {'en': 5}}, {'localization': ['en', 'horse']},
+                        {'text': None, 'language': 'en', 'translations': []}):
+            response = self.post('/generate-speech', payload)
+            self.assertEqual(response.status_code, 400, payload)
+
+    def test_non_object_payload_rejected(self):
+        for body in ('["horse"]', 'null'):
+            for url in ('/generate-speech', '/generate-speech-batch'):
+                response = self.app.post(url, headers=self.headers, data=body, content_type='application/json')
+                self.assertEqual(response.status_code, 400, (url, body))
+
+    def test_stream(self):
+        response = self.post('/generate-speech?stream=1', {'localization': {'en': 'horse', 'de': 'Pferd'}})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.data, b'[en:horse][de:Pferd]')
+
+    def test_stream_skips_failed_segment(self):
+        def flaky_tts(language, text):
+            if language == 'en':
+                raise Exception('upstream failed')
+            return fake_tts(language, text)
+
+        with mock.patch('langserver.routes.generate_tts', side_effect=flaky_tts):
+            response = self.post('/generate-speech', {'localization': {'en': 'horse', 'de': 'Pferd'}, 'stream': True})
+        self.assertEqual(response.data, b'[de:Pferd]')
+
+    def test_busy_returns_503(self):
+        with mock.patch('langserver.routes.speech_scheduler.submit_group', side_effect=SchedulerBusy(3)):
+            response = self.post('/generate-speech', {'localization': {'en': 'horse'}})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '3')
+
+class SpeechCachingTestCase(SpeechTestCase):
+
+    def test_etag_and_conditional_request(self):
+        payload = {'localization': {'en': 'horse', 'de': 'Pferd'}}
+        first = self.post('/generate-speech', payload)
+        etag = first.headers['ETag']
+        self.assertEqual(first.headers['Cache-Control'], app.config['SPEECH_CACHE_CONTROL'])
+
+        with mock.patch('langserver.routes.speech_scheduler.submit_group') as submit:
+            second = self.app.post('/generate-speech', headers=dict(self.headers, **{'If-None-Match': etag}),
+                                   data=json.dumps({'localization': {'en': ' horse', 'de': 'Pferd'}}),
+                                   content_type='application/json')
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers['ETag'], etag)
+        submit.assert_not_called()
+
+    def test_get_form_matches_post(self):
+        post = self.post('/generate-speech', {'text': 'horse', 'language': 'en', 'translations': ['zh-TW', 'de']})
+        get = self.app.get('/generate-speech?text=horse&language=en&translations=zh-TW,de', headers=self.headers)
+        self.assertEqual(get.status_code, 200)
+        self.assertEqual(get.data, post.data)
+        self.assertEqual(get.headers['ETag'], post.headers['ETag'])
+
+        get = self.app.get('/generate-speech?localization=en:horse&localization=de:Pferd', headers=self.headers)
+        self.assertEqual(get.data, b'[en:horse][de:Pferd]')
+
+    def test_partial_response_not_cacheable(self):
+        def flaky_tts(language, text):
+            if language == 'de':
+                raise Exception('upstream failed')
+            return fake_tts(language, text)
+
+        with mock.patch('langserver.routes.generate_tts', side_effect=flaky_tts):
+            response = self.post('/generate-speech', {'localization': {'en': 'horse', 'de': 'Pferd'}})
+        self.assertEqual(response.headers['Cache-Control'], 'no-store')
+        self.assertNotIn('ETag', response.headers)
+        self.assertEqual(response.headers['X-Failed-Segments'], 'de')
+        self.assertEqual(response.data, b'[en:horse]')
+
+    def test_all_segments_failed(self):
+        with mock.patch('langserver.routes.generate_tts', side_effect=Exception('upstream failed')):
+            response = self.post('/generate-speech', {'localization': {'en': 'horse', 'de': 'Pferd'}})
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual([segment['language'] for segment in response.json['segments']], ['en', 'de'])
+
+class GenerateSpeechBatchTestCase(SpeechTestCase):
+
+    def test_batch_deduplicates_segments(self):
+        calls = []
+        def counting_tts(language, text):
+            calls.append((language, text))
+            return fake_tts(language, text)
+
+        with mock.patch('langserver.routes.generate_tts', side_effect=counting_tts):
+            response = self.post('/generate-speech-batch', {'items': [
+                {'localization': {'en': 'horse', 'de': 'Pferd'}},
+                {'localization': {'en': ' horse', 'fr': 'cheval'}},
+                {'text': 'horse', 'language': 'xx', 'translations': []},
+            ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(calls), [('de', 'Pferd'), ('en', 'horse'), ('fr', 'cheval')])
+
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            manifest = json.loads(zf.read('manifest.json'))
+            self.assertEqual(zf.read('0.mp3'), b'[en:horse][de:Pferd]')
+            self.assertEqual(zf.read('1.mp3'), b'[en:horse][fr:cheval]')
+        self.assertEqual([entry['status'] for entry in manifest], ['ok', 'ok', 'error'])
+        self.assertEqual(manifest[2]['error'], 'Primary language is invalid')
+
+    def test_batch_synthesizes_canonical_codes(self):
+        with mock.patch('langserver.routes.generate_tts', side_effect=fake_tts) as tts:
+            response = self.post('/generate-speech-batch', {'items': [
+                {'localization': {'zh-tw': '馬'}}, {'localization': {'ZH-TW': '馬'}},
+            ]})
+        self.assertEqual(response.status_code, 200)
+        tts.assert_called_once_with('zh-TW', '馬')
+
+    def test_malformed_item_fails_alone(self):
+        response = self.post('/generate-speech-batch', {'items': [
+            {'localization': {'en': 5}}, 'horse', {'localization': {'en': 'horse'}},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+            manifest = json.loads(zf.read('manifest.json'))
+            self.assertEqual(zf.read('2.mp3'), b'[en:horse]')
+        self.assertEqual([entry['status'] for entry in manifest], ['error', 'error', 'ok'])
+        self.assertEqual(manifest[0]['error'], 'Text for en must be a string')
+
+    def test_batch_reports_failed_segments(self):
+        def flaky_tts(language, text):
+            if language == 'de':
+                raise Exception('upstream failed')
+            return fake_tts(language, text)
+
+        with mock.patch('langserver.routes.generate_tts', side_effect=flaky_tts):
+            response = self.app.post('/generate-speech-batch', headers=dict(self.headers, Accept='multipart/mixed'),
+                                     json={'items': [{'localization': {'en': 'horse', 'de': 'Pferd'}}]})
+            body = response.data
+        self.assertTrue(response.mimetype.startswith('multipart/mixed'))
+        self.assertIn(b'X-Item-Status: partial', body)
+        self.assertIn(b'upstream failed', body)
+        self.assertIn(b'[en:horse]', body)
+
+    def test_batch_requires_items(self):
+        self.assertEqual(self.post('/generate-speech-batch', {'items': []}).status_code, 400)
+
+class SpeechJobTestCase(SpeechTestCase):
+
+    def wait_for_job(self, job_id):
+        for _ in range(100):
+            status = self.app.get(f'/speech-jobs/{job_id}', headers=self.headers).get_json()
+            if status['status'] in ('done', 'failed'):
+                return status
+            time.sleep(0.05)
+        self.fail('Job did not finish')
+
+    def test_job_lifecycle(self):
+        def flaky_tts(language, text):
+            if language == 'de':
+                raise Exception('upstream failed')
+            return fake_tts(language, text)
+
+        with mock.patch('langserver.routes.generate_tts', side_effect=flaky_tts):
+            response = self.post('/speech-jobs', {'localization': {'en': 'horse', 'de': 'Pferd', 'fr': 'cheval'}})
+            self.assertEqual(response.status_code, 202)
+            job_id = response.get_json()['job_id']
+            status = self.wait_for_job(job_id)
+
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual((status['total'], status['completed'], status['failed']), (3, 2, 1))
+        self.assertEqual([segment['status'] for segment in status['segments']], ['done', 'failed', 'done'])
+
+        audio = self.app.get(f'/speech-jobs/{job_id}/audio', headers=self.headers)
+        self.assertEqual(audio.data, b'[en:horse][fr:cheval]')
+
+    def test_invalid_job_rejected(self):
+        self.assertEqual(self.post('/speech-jobs', {'localization': {'xx': 'horse'}}).status_code, 400)
+        self.assertEqual(self.app.get('/speech-jobs/missing', headers=self.headers).status_code, 404)
+
+    def test_polling_not_limited_per_ip(self):
+        limiter.enabled = True
+        statuses = {self.app.get('/speech-jobs/missing', headers=self.headers).status_code for _ in range(60)}
+        self.assertEqual(statuses, {404})
+
+    def test_runner_started_by_requests_not_import(self):
+        script = ("import threading, langserver.routes; "
+                  "print(any(t.name.startswith('speech-job') for t in threading.enumerate()))")
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.stdout.strip(), 'False', result.stderr)
+
+        from langserver.routes import job_runner
+        self.app.get('/healthz')
+        self.assertTrue(job_runner._threads.running())
+
+    def test_idle_poll_is_read_only(self):
+        from langserver import db
+        from langserver.routes import job_runner
+        with app.app_context(), mock.patch.object(db.session, 'commit') as commit:
+            job_runner._find_queued_job()
+        commit.assert_not_called()
+
+class ChunkedSynthesisTestCase(unittest.TestCase):
+
+    def setUp(self):
+        segment_cache.clear()
+
+    def test_long_text_synthesized_per_chunk(self):
+        from langserver import routes, upstream
+        first = ' '.join(['alpha'] * 15) + '.'
+        second = ' '.join(['beta'] * 15) + '.'
+        calls = []
+
+        def fake_synthesize(language, text):
+            calls.append(text)
+            return f"<{text[:4]}>".encode()
+
+        with mock.patch.object(upstream, 'synthesize', side_effect=fake_synthesize), \
+                mock.patch.object(routes.audio_store, 'enabled', False):
+            self.assertEqual(routes.generate_tts('en', f"{first} {second}"), b'<alph><beta>')
+            # Editing the second sentence only re-synthesizes that chunk
+            third = ' '.join(['gamma'] * 15) + '.'
+            self.assertEqual(routes.generate_tts('en', f"{first} {third}"), b'<alph><gamm>')
+
+        self.assertEqual([call.split()[0] for call in calls], ['alpha', 'beta', 'gamma'])
+
+    def test_falls_through_to_next_engine(self):
+        from langserver import routes
+        broken, local = mock.Mock(), mock.Mock()
+        for engine, name in ((broken, 'remote'), (local, 'local')):
+            engine.name = name
+            engine.slots = threading.Lock()
+            engine.split_text.side_effect = lambda language, text: [text]
+        broken.synthesize.side_effect = Exception('throttled')
+        local.synthesize.return_value = b'local audio'
+
+        with mock.patch.object(routes.tts_router, 'candidates', return_value=[broken, local]), \
+                mock.patch.object(routes.audio_store, 'enabled', False):
+            self.assertEqual(routes.generate_tts('en', 'fallthrough'), b'local audio')
+        broken.synthesize.assert_called_once_with('en', 'fallthrough')
+
+    def check_chunk_store(self, remote_fails_on):
+        from langserver import routes
+        remote, local = mock.Mock(), mock.Mock()
+        for engine, name in ((remote, 'remote'), (local, 'local')):
+            engine.name = name
+            engine.slots = threading.Lock()
+            engine.split_text.side_effect = lambda language, text: text.split('|') if '|' in text else [text]
+        # An Info header frame on each chunk must not end up in the middle of the joined audio
+        info_frame = b'\xff\xfb\x90\x64' + b'\x00' * 32 + b'Info' + b'\x00' * 377
+
+        def synthesize(language, text):
+            return info_frame + text.encode()
+
+        def remote_synthesize(language, text):
+            if text == remote_fails_on:
+                raise Exception('throttled')
+            return synthesize(language, text)
+
+        remote.synthesize.side_effect = remote_synthesize
+        local.synthesize.side_effect = synthesize
+
+        with mock.patch.object(routes.tts_router, 'candidates', return_value=[remote, local]), \
+                mock.patch.object(routes.audio_store, 'get', return_value=None), \
+                mock.patch.object(routes.audio_store, 'put') as put:
+            self.assertEqual(routes.generate_tts('en', 'one|two'), b'onetwo')
+        return [call.args[0] for call in put.call_args_list]
+
+    def test_chunked_audio_stored_under_producing_engine(self):
+        from langserver.audio_store import AudioStore
+        self.assertIn(AudioStore.digest('remote', 'en', 'one|two'), self.check_chunk_store(remote_fails_on=None))
+
+    def test_mixed_engine_chunks_not_stored(self):
+        from langserver.audio_store import AudioStore
+        digests = self.check_chunk_store(remote_fails_on='two')
+        self.assertIn(AudioStore.digest('local', 'en', 'two'), digests)
+        self.assertNotIn(AudioStore.digest('remote', 'en', 'one|two'), digests)
+        self.assertNotIn(AudioStore.digest('local', 'en', 'one|two'), digests)
+
+    def test_stored_audio_served_while_breaker_open(self):
+        from langserver import routes, tts_caller
+        from langserver.audio_store import AudioStore
+        for _ in range(tts_caller.breaker.failure_threshold):
+            tts_caller.breaker.record_failure()
+        self.addCleanup(tts_caller.breaker.record_success)
+        self.assertEqual(routes.tts_router.candidates('en'), [])
+
+        stored = {AudioStore.digest('gtts', 'en', 'while throttled'): b'stored audio'}
+        with mock.patch.object(routes.audio_store, 'get', side_effect=stored.get):
+            self.assertEqual(routes.generate_tts('en', 'while throttled'), b'stored audio')
+            with self.assertRaises(Exception):
+                routes.generate_tts('en', 'never stored')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import threading
+import unittest
+from unittest import mock
+from langserver.threads import BackgroundThreads
+
+class BackgroundThreadsTestCase(unittest.TestCase):
+
+    def test_started_once_per_process(self):
+        release = threading.Event()
+        resets = []
+        threads = BackgroundThreads(lambda: release.wait(5), 'test-worker', count=2,
+                                    on_start=lambda: resets.append(1))
+        self.addCleanup(release.set)
+
+        threads.start()
+        threads.start()
+        names = sorted(t.name for t in threading.enumerate() if t.name.startswith('test-worker'))
+        self.assertEqual(names, ['test-worker-0', 'test-worker-1'])
+        self.assertEqual(len(resets), 1)
+
+        # A forked child has a new pid and none of the parent's threads
+        with mock.patch('langserver.threads.os.getpid', return_value=-1):
+            self.assertFalse(threads.running())
+            threads.start()
+        self.assertEqual(len(resets), 2)
+
+if __name__ == '__main__':
+    unittest.main()
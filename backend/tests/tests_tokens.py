@@ -0,0 +1,85 @@
+import unittest
+from langserver import app, db, limiter
+from langserver.models import APIToken
+
+class TokenAdminTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        limiter.enabled = False
+        self.admin = {'Authorization': app.config['ADMIN_TOKEN']}
+        with app.app_context():
+            APIToken.query.delete()
+            db.session.commit()
+
+    def tearDown(self):
+        limiter.enabled = True
+        with app.app_context():
+            APIToken.query.delete()
+            db.session.commit()
+
+    def add_tokens(self, ids, **extra):
+        return self.app.post('/add-tokens', headers=self.admin,
+                             json={'tokens': [dict(extra, id=token_id) for token_id in ids]})
+
+    def test_bulk_provisioning(self):
+        response = self.add_tokens(['tenant-1', 'tenant-2'], rate_limit=7)
+        self.assertEqual(response.status_code, 201)
+        tokens = response.get_json()['tokens']
+        self.assertEqual(set(tokens), {'tenant-1', 'tenant-2'})
+
+        listed = self.app.get('/list-tokens', headers={'Authorization': tokens['tenant-1']})
+        self.assertEqual(listed.status_code, 200)
+        self.assertEqual([(t['id'], t['rate_limit']) for t in listed.get_json()], [('tenant-1', 7), ('tenant-2', 7)])
+
+    def test_bulk_provisioning_is_all_or_nothing(self):
+        self.add_tokens(['taken'])
+        response = self.add_tokens(['fresh', 'taken'])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()['existing'], ['taken'])
+        with app.app_context():
+            self.assertIsNone(db.session.get(APIToken, 'fresh'))
+
+        self.assertEqual(self.add_tokens(['dup', 'dup']).status_code, 400)
+        self.assertEqual(self.add_tokens(['bad id']).status_code, 400)
+
+    def test_bulk_provisioning_requires_admin(self):
+        token = self.add_tokens(['tenant']).get_json()['tokens']['tenant']
+        response = self.app.post('/add-tokens', headers={'Authorization': token}, json={'tokens': [{'id': 'other'}]})
+        self.assertEqual(response.status_code, 403)
+
+    def test_keyset_pagination_and_filters(self):
+        self.add_tokens([f"app-{i:02d}" for i in range(5)] + ['other'])
+        self.add_tokens(['app-slow'], rate_limit=1)
+
+        page = self.app.get('/list-tokens?prefix=app-&limit=3', headers=self.admin)
+        self.assertEqual([t['id'] for t in page.get_json()], ['app-00', 'app-01', 'app-02'])
+        cursor = page.headers['X-Next-Cursor']
+        page = self.app.get(f'/list-tokens?prefix=app-&limit=3&after={cursor}', headers=self.admin)
+        self.assertEqual([t['id'] for t in page.get_json()], ['app-03', 'app-04', 'app-slow'])
+        self.assertNotIn('X-Next-Cursor', page.headers)
+
+        page = self.app.get('/list-tokens?rate_limit=1', headers=self.admin)
+        self.assertEqual([t['id'] for t in page.get_json()], ['app-slow'])
+        page = self.app.get('/list-tokens?created_after=2999-01-01', headers=self.admin)
+        self.assertEqual(page.get_json(), [])
+        self.assertEqual(self.app.get('/list-tokens?limit=x', headers=self.admin).status_code, 400)
+
+    def test_prefix_wildcards_are_literal(self):
+        self.add_tokens(['a_1', 'ab1'])
+        page = self.app.get('/list-tokens?prefix=a_', headers=self.admin)
+        self.assertEqual([t['id'] for t in page.get_json()], ['a_1'])
+
+    def test_revoke_by_id_or_hash(self):
+        self.add_tokens(['by-id', 'by-hash'])
+        with app.app_context():
+            hashed = db.session.get(APIToken, 'by-hash').token
+        self.assertEqual(self.app.post('/revoke-token', json={'token': 'by-id'}).status_code, 200)
+        self.assertEqual(self.app.post('/revoke-token', json={'token': hashed}).status_code, 200)
+        self.assertEqual(self.app.post('/revoke-token', json={'token': 'by-id'}).status_code, 404)
+        with app.app_context():
+            self.assertEqual(APIToken.query.count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
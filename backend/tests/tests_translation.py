@@ -0,0 +1,88 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from langserver import app, db
+from langserver.models import Translation
+from langserver.resilience import CircuitBreaker, ResilientCaller, UpstreamThrottled
+from langserver.translation import TranslationBatcher, TranslationCache, translation_key
+
+class TranslationCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        with app.app_context():
+            db.create_all()
+        self.cache = TranslationCache(app, 1024)
+
+    def tearDown(self):
+        with app.app_context():
+            Translation.query.delete()
+            db.session.commit()
+
+    def test_memory_hit(self):
+        self.assertIsNone(self.cache.get('en', 'de', 'horse'))
+        self.cache.set('en', 'de', 'horse', 'Pferd')
+        self.assertEqual(self.cache.get('en', 'de', ' horse '), 'Pferd')
+
+    def test_persisted_across_instances(self):
+        self.cache.set('en', 'zh-TW', 'horse', '馬')
+        fresh = TranslationCache(app, 1024)
+        self.assertEqual(fresh.get('en', 'zh-tw', 'horse'), '馬')
+
+    def test_duplicate_write_is_ignored(self):
+        self.cache.set('en', 'de', 'horse', 'Pferd')
+        TranslationCache(app, 1024).set('en', 'de', 'horse', 'Pferd')
+        with app.app_context():
+            self.assertEqual(Translation.query.count(), 1)
+
+    def test_memory_only(self):
+        cache = TranslationCache(app, 1024, persist=False)
+        cache.set('en', 'fr', 'horse', 'cheval')
+        self.assertIsNone(TranslationCache(app, 1024).get('en', 'fr', 'horse'))
+        self.assertNotEqual(translation_key('en', 'fr', 'horse'), translation_key('fr', 'en', 'horse'))
+
+class TranslationBatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.upstream = mock.Mock()
+        self.upstream.translate_many.side_effect = lambda triples: [f"{text}@{dest}" for text, _, dest in triples]
+        self.upstream.translate.side_effect = lambda text, src, dest: f"{text}@{dest}"
+
+    def translate_concurrently(self, batcher, triples):
+        with ThreadPoolExecutor(len(triples)) as executor:
+            return list(executor.map(lambda triple: batcher.translate(*triple), triples))
+
+    def test_concurrent_targets_share_one_call(self):
+        batcher = TranslationBatcher(self.upstream, threading.Semaphore(1), window=0.05, max_batch=16)
+        triples = [('horse', 'en', dest) for dest in ('de', 'fr', 'zh-TW')]
+        self.assertEqual(self.translate_concurrently(batcher, triples), ['horse@de', 'horse@fr', 'horse@zh-TW'])
+        self.assertEqual(self.upstream.translate_many.call_count, 1)
+        self.assertEqual(batcher.batched_items, 3)
+
+    def test_full_batch_sent_immediately(self):
+        batcher = TranslationBatcher(self.upstream, threading.Semaphore(1), window=10, max_batch=2)
+        triples = [('horse', 'en', 'de'), ('dog', 'en', 'de')]
+        self.assertEqual(sorted(self.translate_concurrently(batcher, triples)), ['dog@de', 'horse@de'])
+
+    def test_falls_back_to_single_calls(self):
+        self.upstream.translate_many.side_effect = Exception('batch rejected')
+        batcher = TranslationBatcher(self.upstream, threading.Semaphore(1), window=0.05, max_batch=16)
+        triples = [('horse', 'en', 'de'), ('dog', 'en', 'fr')]
+        self.assertEqual(self.translate_concurrently(batcher, triples), ['horse@de', 'dog@fr'])
+        self.assertEqual(batcher.fallbacks, 1)
+    def test_failed_batch_counts_once_against_breaker(self):
+        self.upstream.translate_many.side_effect = UpstreamThrottled('429')
+        breaker = CircuitBreaker('translate', failure_threshold=2, reset_timeout=60)
+        caller = ResilientCaller('translate', breaker, deadline=1, retries=0, hedge=False, hedge_workers=2)
+        batcher = TranslationBatcher(self.upstream, threading.Semaphore(1), window=0.05, max_batch=16,
+                                     caller=caller)
+        triples = [('horse', 'en', dest) for dest in ('de', 'fr', 'it')]
+        with ThreadPoolExecutor(len(triples)) as executor:
+            futures = [executor.submit(batcher.translate, *triple) for triple in triples]
+            for future in futures:
+                self.assertRaises(UpstreamThrottled, future.result)
+        self.assertEqual(self.upstream.translate_many.call_count, 1)
+        self.assertEqual(breaker.state, 'closed')
+
+if __name__ == '__main__':
+    unittest.main()
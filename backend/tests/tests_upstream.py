@@ -0,0 +1,80 @@
+import base64
+import json
+import unittest
+from unittest import mock
+from gtts.tts import gTTSError
+import requests
+from langserver.resilience import UpstreamThrottled
+from langserver.upstream import UpstreamClient
+from benchmarks.fake_upstream import FakeUpstream, fake_audio
+
+def rpc_line(audio):
+    encoded = base64.b64encode(audio).decode('ascii')
+    return f'[["wrb.fr","jQ1olc","[\\"{encoded}\\"]",null,null,null,"generic"]]'.encode()
+
+class UpstreamClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = UpstreamClient(4, timeout=3)
+
+    def test_synthesize_joins_chunks_over_one_session(self):
+        responses = [mock.Mock(status_code=200, reason='OK', iter_lines=mock.Mock(return_value=[b')]}\'', rpc_line(chunk)])) for chunk in (b'one', b'two')]
+        long_text = ' '.join(['word'] * 40)
+        with mock.patch.object(self.client.session, 'send', side_effect=responses) as send:
+            self.assertEqual(self.client.synthesize('en', long_text), b'onetwo')
+        self.assertEqual(send.call_count, 2)
+
+    def test_synthesize_without_audio_raises(self):
+        response = mock.Mock(status_code=200, reason='OK', iter_lines=mock.Mock(return_value=[b'"jQ1olc" but nothing else']))
+        with mock.patch.object(self.client.session, 'send', return_value=response):
+            with self.assertRaises(gTTSError):
+                self.client.synthesize('en', 'horse')
+
+    def test_synthesize_throttled_uses_timeout(self):
+        response = mock.Mock(status_code=429, reason='Too Many Requests')
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(response=response)
+        with mock.patch.object(self.client.session, 'send', return_value=response) as send:
+            with self.assertRaises(UpstreamThrottled):
+                self.client.synthesize('en', 'horse')
+        self.assertEqual(send.call_args.kwargs['timeout'], 3)
+
+    def test_translator_reused_per_thread(self):
+        self.assertIs(self.client.translator(), self.client.translator())
+
+    def test_translator_timeout(self):
+        self.assertEqual(self.client.translator().client.timeout.read_timeout, 3)
+
+    def test_translate_many_parses_indexed_responses(self):
+        def envelope(index, text):
+            parsed = [None, [[[None, None, None, True, None, [[text]]]]]]
+            return ['wrb.fr', 'MkEWBc', json.dumps(parsed), None, None, None, str(index)]
+
+        body = ")]}'\n\n123\n" + json.dumps([envelope(2, 'cheval')]) + "\n45\n" + json.dumps([envelope(1, 'Pferd')]) + "\n"
+        translator = self.client.translator()
+        with mock.patch.object(translator.client, 'post', return_value=mock.Mock(status_code=200, text=body)) as post:
+            result = self.client.translate_many([('horse', 'en', 'de'), ('horse', 'en', 'fr')])
+        self.assertEqual(result, ['Pferd', 'cheval'])
+        self.assertEqual(post.call_count, 1)
+
+    def test_translate_many_missing_result_raises(self):
+        translator = self.client.translator()
+        with mock.patch.object(translator.client, 'post', return_value=mock.Mock(status_code=200, text=")]}'\n")):
+            with self.assertRaises(Exception):
+                self.client.translate_many([('horse', 'en', 'de'), ('horse', 'en', 'fr')])
+
+class FakeUpstreamTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeUpstream(latency=0).start()
+        self.addCleanup(self.fake.stop)
+        self.client = UpstreamClient(2, timeout=5, tts_url=self.fake.url, translate_url=self.fake.url)
+
+    def test_synthesize_and_translate_against_overridden_urls(self):
+        self.assertEqual(self.client.synthesize('en', 'horse'), fake_audio('horse'))
+        self.assertEqual(self.client.translate('horse', 'en', 'de'), 'horse@de')
+        self.assertEqual(self.client.translate_many([('horse', 'en', 'de'), ('cat', 'en', 'fr')]), ['horse@de', 'cat@fr'])
+        self.assertEqual(self.fake.snapshot()['tts_rpcs'], 1)
+        self.assertEqual(self.fake.snapshot()['translate_rpcs'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
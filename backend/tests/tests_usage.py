@@ -0,0 +1,105 @@
+import json
+import unittest
+from unittest import mock
+from langserver import app, db, limiter, segment_cache, usage_recorder
+from langserver.models import APIToken, TokenUsage
+from langserver.usage import UsageRecorder
+
+def fake_tts(language, text):
+    return f"[{language}:{text}]".encode()
+
+class UsageRecorderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        with app.app_context():
+            TokenUsage.query.delete()
+            db.session.commit()
+        self.recorder = UsageRecorder(app, flush_interval=3600)
+
+    def usage(self, token_id):
+        with app.app_context():
+            return [(row.requests, row.characters) for row in TokenUsage.query.filter_by(token_id=token_id)]
+
+    def test_counters_accumulate_across_flushes(self):
+        for _ in range(100):
+            self.recorder.record('acc', requests=1, characters=5)
+        self.recorder.record('other', requests=1)
+        self.assertEqual(self.recorder.flush(), 2)
+        self.recorder.record('acc', requests=1, characters=5)
+        self.assertEqual(self.recorder.flush(), 1)
+        self.assertEqual(self.usage('acc'), [(101, 505)])
+        self.assertEqual(self.recorder.flush(), 0)
+
+    def test_one_statement_per_flush(self):
+        for token_id in ('a', 'b', 'c'):
+            self.recorder.record(token_id, requests=1)
+        with app.app_context():
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            db.event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                self.recorder.flush()
+            finally:
+                db.event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertEqual(len([s for s in statements if 'token_usage' in s]), 1)
+
+    def test_failed_flush_is_retried(self):
+        self.recorder.record('retry', requests=2)
+        with mock.patch.object(self.recorder, '_upsert', side_effect=Exception('database is locked')):
+            self.assertEqual(self.recorder.flush(), 0)
+        self.recorder.record('retry', requests=1)
+        self.recorder.flush()
+        self.assertEqual(self.usage('retry'), [(3, 0)])
+
+class TokenUsageEndpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = app.test_client()
+        limiter.enabled = False
+        segment_cache.clear()
+        # Drop counters other tests left pending
+        usage_recorder.flush()
+        with app.app_context():
+            TokenUsage.query.delete()
+            db.session.commit()
+        self.token = self.app.post('/add-token', json={'id': 'usage', 'rate_limit': 100}).get_json()['token']
+        patch = mock.patch('langserver.routes.generate_tts', side_effect=fake_tts)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        limiter.enabled = True
+        with app.app_context():
+            APIToken.query.delete()
+            db.session.commit()
+
+    def speech(self, token, payload):
+        return self.app.post('/generate-speech', headers={'Authorization': token},
+                             data=json.dumps(payload), content_type='application/json')
+
+    def test_usage_recorded_per_token(self):
+        response = self.speech(self.token, {'localization': {'en': 'horse', 'de': 'Pferd'}})
+        streamed = self.speech(self.token, {'localization': {'en': 'horse'}, 'stream': True})
+        self.assertEqual(streamed.data, b'[en:horse]')
+        # The admin token is not accounted
+        self.speech(app.config['ADMIN_TOKEN'], {'localization': {'en': 'horse'}})
+
+        usage = self.app.get('/token-usage', headers={'Authorization': app.config['ADMIN_TOKEN']}).get_json()
+        self.assertEqual(usage, [{
+            'token_id': 'usage', 'requests': 2, 'segments': 3, 'characters': 15, 'cache_hits': 0,
+            'bytes_served': len(response.data) + len(streamed.data),
+        }])
+
+    def test_tokens_only_see_their_own_usage(self):
+        usage_recorder.record('someone-else', requests=5)
+        self.speech(self.token, {'localization': {'en': 'horse'}})
+        response = self.app.get('/token-usage?token_id=someone-else', headers={'Authorization': self.token})
+        self.assertEqual(response.get_json()['token_id'], 'usage')
+        self.assertEqual([bucket['requests'] for bucket in response.get_json()['buckets']], [1])
+
+    def test_invalid_since(self):
+        response = self.app.get('/token-usage?since=yesterday', headers={'Authorization': app.config['ADMIN_TOKEN']})
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
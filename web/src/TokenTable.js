@@ -7,6 +7,7 @@ import './App.css';
 function TokenTable({ adminToken }) {
   const [id, setId] = useState('');
   const [tokens, setTokens] = useState([]);
+  const [usage, setUsage] = useState({});
   const [error, setError] = useState('');
   const [editTokenId, setEditTokenId] = useState(null);
   const [editedRateLimit, setEditedRateLimit] = useState({});
@@ -28,6 +29,35 @@ function TokenTable({ adminToken }) {
       console.error('Error fetching tokens:', error);
       setError('Failed to fetch tokens');
     }
+    fetchUsage();
+  };
+
+  const fetchUsage = async () => {
+    try {
+      const response = await axios.get('/token-usage', {
+        headers: { Authorization: adminToken }
+      });
+      const usageById = {};
+      response.data.forEach(entry => { usageById[entry.token_id] = entry; });
+      setUsage(usageById);
+    } catch (error) {
+      console.error('Error fetching usage:', error);
+    }
+  };
+
+  const formatUsage = (entry) => {
+    if (!entry) {
+      return '-';
+    }
+    const megabytes = (entry.bytes_served / (1024 * 1024)).toFixed(1);
+    return `${entry.requests} req, ${entry.characters} chars, ${megabytes} MB`;
+  };
+
+  const usageDetails = (entry) => {
+    if (!entry) {
+      return 'No usage recorded';
+    }
+    return `${entry.segments} segments, ${entry.cache_hits} cache hits, ${entry.bytes_served} bytes`;
   };
 
   const addToken = async () => {
@@ -152,6 +182,7 @@ function TokenTable({ adminToken }) {
             <th className="hashed-token">Hashed+Salted Token</th>
             <th>Rate Limit</th>
             <th>Date Created</th>
+            <th>Usage</th>
             <th>Actions</th>
           </tr>
         </thead>
@@ -172,6 +203,7 @@ function TokenTable({ adminToken }) {
                 )}
               </td>
               <td>{token.date_created}</td>
+              <td title={usageDetails(usage[token.id])}>{formatUsage(usage[token.id])}</td>
               <td>
                 {editTokenId === token.id ? (
                   <>